@@ -1,34 +1,84 @@
+import os
+import uuid
+
 import pandas as pd
 import streamlit as st
-import datetime
-#from snowflake_connector import get_snowflake_session
+from catalog_cache import get_catalog_cache
+from catalog_search import get_catalog_index
+from bulk_loader import bulk_load
+from validation import FLOAT_TYPES, compile_checks, validate_frame, validate_rows
+from pagination import PAGE_SIZES, KeysetPager, cached_row_count
+from page_cache import get_page_cache
+from streaming_ingest import (
+    MAX_REPORTED_ERRORS,
+    STREAMING_THRESHOLD,
+    ingest_chunks,
+    preview_csv,
+    preview_xlsx,
+    read_csv_chunks,
+    read_xlsx_chunks,
+    spool_upload,
+    xlsx_sheet_names,
+)
+from sheet_ingest import ingest_sheets, report_frame
+from typed_csv import parse_csv
+from export import (
+    EXPORT_FORMATS,
+    PRESIGNED_URL_EXPIRY,
+    STAGE_EXPORT_THRESHOLD,
+    ExportTooLargeError,
+    estimate_export_bytes,
+    export_table,
+)
+from upload_jobs import JobLimitError, get_job_manager
+from snowflake_connector import PoolExhaustedError, get_session_pool
+from query_log import InstrumentedSession, feature, get_query_log, render_debug_panel
+from change_set import NullKeyError, apply_change_set, build_change_set
+from filter_values import LOW_CARDINALITY_LIMIT, FilterValueService, column_kind, filter_clauses
+from table_cache import invalidate_table
+from table_schema import get_table_schema
+from sql_builder import Sql, bind_value, ident, run
 
 
 class SnowflakeDataApp:
     def __init__(self):
         st.set_page_config(page_title="Snowflake Data App", layout="wide")
-        cnx=st.connection("snowflake")
-        self.session=cnx.session()
-        #self.session = get_snowflake_session()
         self._initialize_session_state()
+        self._session_pool = get_session_pool()
+        self._owner = self._session_owner()
+        try:
+            session = self._session_pool.session_for(self._owner)
+        except PoolExhaustedError as e:
+            st.error(f"❌ {e} Please try again in a moment.")
+            st.stop()
+        query_log = get_query_log()
+        query_log.start_rerun()
+        self.session = InstrumentedSession(session, query_log)
         self.selected_db = st.session_state.get("selected_db")
         self.selected_table = st.session_state.get("selected_table")
         self.selected_schema = st.session_state.get("selected_schema")
 
+    def close(self):
+        """Hand the user's session back to the pool at the end of the rerun."""
+        self._session_pool.done_with(self._owner)
+
     def _initialize_session_state(self):
         for key, default in {
             "selected_db":None,
             "selected_table": None,
             "selected_schema": None,
             "username": "User",  # Default username
+            "browser_session_id": uuid.uuid4().hex,
             "data_entry": pd.DataFrame(),
-            "pagination_offset": 0,
+            "page_number": 0,
+            "page_size": 50,
             "new_data": pd.DataFrame(),
             'filter_values': {}
         }.items():
             if key not in st.session_state:
                 st.session_state[key] = default
 
+    @feature("sidebar")
     def _sidebar(self):
         st.markdown(
             """
@@ -91,11 +141,21 @@ class SnowflakeDataApp:
         with st.sidebar:
             st.markdown("---")
             st.subheader("📁 Databases, Schemas and Tables")
+            catalog = get_catalog_cache()
+            catalog_index = get_catalog_index()
+            catalog_index.ensure_fresh(get_session_pool())
+            self._catalog_search(catalog_index)
+
+            st.toggle("🐞 Query debug panel", key="query_debug")
+
+            if st.button("🔄 Refresh", key="catalog_refresh"):
+                catalog.refresh()
+                catalog_index.refresh(get_session_pool())
+                st.rerun()
 
             try:
-                # 🔹 Step 1: Get list of databases
-                db_results = self.session.sql("SHOW DATABASES").collect()
-                database_list = [db["name"] for db in db_results]
+                # 🔹 Step 1: Get list of databases (cached, see catalog_cache.DEFAULT_TTLS)
+                database_list = catalog.databases(self.session)
 
                 # 🔹 Step 2: Show databases as buttons
                 for db_name in database_list:
@@ -115,12 +175,7 @@ class SnowflakeDataApp:
                     # 🔹 Step 3: If DB is selected, show schemas
                     if is_selected_db:
                         try:
-                            schemas_query = [
-                                s["SCHEMA_NAME"]
-                                for s in self.session.sql(
-                                    f"SELECT schema_name FROM {db_name}.information_schema.schemata WHERE schema_name <> 'INFORMATION_SCHEMA'"
-                                ).collect()
-                            ]
+                            schemas_query = catalog.schemas(self.session, db_name)
 
                             for schema_name in schemas_query:
                                 is_selected_schema = schema_name == st.session_state.get("selected_schema")
@@ -137,9 +192,8 @@ class SnowflakeDataApp:
                                 # 🔹 Step 4: If schema is selected, show tables
                                 if is_selected_schema:
                                     try:
-                                        tables = self.session.sql(f"SHOW TABLES IN {db_name}.{schema_name}").collect()
-                                        for table_info in tables:
-                                            table_name = table_info["name"]
+                                        tables = catalog.tables(self.session, db_name, schema_name)
+                                        for table_name in tables:
                                             if st.button(
                                                 f"📄 {table_name}",
                                                 key=f"table_{db_name}_{schema_name}_{table_name}",
@@ -155,102 +209,98 @@ class SnowflakeDataApp:
             except Exception as e:
                 st.error(f"Could not load databases: {e}")
 
-            
-
 
-    def _validate_row(self, row, column_metadata, table_name,schema_name,database_name):
-        errors = []
-        # --- Field-level validation ---
-        for col_meta in column_metadata:
-            col_name = col_meta['COLUMN_NAME']
-            data_type = col_meta['DATA_TYPE']
-            is_nullable = col_meta['IS_NULLABLE'] == 'YES'
-            value = row.get(col_name)
 
-            # Not Null check
-            if not is_nullable and (pd.isna(value) or str(value).strip() == ""):
-                errors.append(f"{col_name} cannot be NULL.")
 
-            # Data Type Validation
-            if pd.notna(value):
-                if data_type == 'DATE' or data_type == 'TIMESTAMP':
-                    try:
-                        # Date format check
-                        datetime.datetime.strptime(str(value), '%Y-%m-%d')
-                    except ValueError:
-                        errors.append(f"{col_name} must be in %Y-%m-%d format.")
-                elif data_type == 'INTEGER':
-                    try:
-                        int(value)
-                    except ValueError:
-                        errors.append(f"{col_name} must be an INTEGER.")
-                elif data_type == 'FLOAT':
-                    try:
-                        float(value)
-                    except ValueError:
-                        errors.append(f"{col_name} must be a FLOAT.")
-                elif data_type == 'STRING':
-                    if not isinstance(value, str):
-                        errors.append(f"{col_name} must be a STRING.")
-                # Add more data types if necessary, e.g., BOOLEAN, DECIMAL, etc.
-
-        # --- Full-row duplicate check (optional, separate from PK check) ---
-        where_clauses = []
-        for col_meta in column_metadata:
-            col_name = col_meta['COLUMN_NAME']
-            value = row.get(col_name)
-            if pd.notna(value):
-                where_clauses.append(f"{col_name} = '{value}'")
-            else:
-                where_clauses.append(f"{col_name} IS NULL")
-
-        if where_clauses:
-            where_clause = " AND ".join(where_clauses)
-            dup_query = f"SELECT COUNT(*) AS COUNT FROM {database_name}.{schema_name}.{table_name} WHERE {where_clause}"
-            result = self.session.sql(dup_query).collect()[0]['COUNT']
-            if result > 0:
-                errors.append(f"Duplicate row found: {row.to_dict()}")
+    def _catalog_search(self, catalog_index):
+        """Search box over every table and column, jumping straight to the chosen table."""
+        search_text = st.text_input("🔎 Find a table", key="catalog_search", placeholder="Table or column name")
+        if catalog_index.built_at is None:
+            st.caption("⏳ Building the search index…")
+        elif catalog_index.error:
+            st.caption(f"⚠️ Search index could not be built: {catalog_index.error}")
+        elif not search_text:
+            st.caption(f"{catalog_index.table_count:,} tables, {catalog_index.column_count:,} columns indexed")
 
-        return errors
+        if not search_text:
+            return
+        hits = catalog_index.search(search_text)
+        if not hits and catalog_index.built_at is not None:
+            st.caption("No matching tables.")
+        for hit in hits:
+            label = f"📄 {hit.fqn}" + (f" · {hit.match}" if hit.kind == "column" else "")
+            if st.button(label, key=f"search_{hit.fqn}"):
+                st.session_state["selected_db"] = hit.database
+                st.session_state["selected_schema"] = hit.schema
+                st.session_state["selected_table"] = hit.table
+                st.rerun()
 
-    def _get_distinct_column_values(self, schema, table, column,database_name):
-        try:
-            query = f"""
-                SELECT DISTINCT {column}
-                FROM {database_name}.{schema}.{table}
-                WHERE {column} IS NOT NULL
-                ORDER BY 1
-            """
-            results = self.session.sql(query).collect()
-            return [row[column] for row in results]
-        except Exception as e:
-            st.error(f"Error fetching values for {column}: {e}")
-            return []
+    @feature("validate")
+    def _validate_rows(self, df, table_schema):
+        """Validate every row of ``df`` and return ``{index: [errors]}`` for the rows that failed."""
+        return validate_rows(self.session, df, table_schema)
+
+    @feature("filter")
+    def _filter_widget(self, service, column_info, other_clauses):
+        """Render the filter control for one column and return its value (``None`` = no filter)."""
+        col_name = column_info.name
+        kind = column_kind(column_info)
+
+        if kind in ("numeric", "date"):
+            low, high = service.value_range(col_name, other_clauses)
+            if low is None or high is None or low == high:
+                st.caption(f"{col_name}: {low if low is not None else 'no values'}")
+                return None
+            if kind == "date":
+                low, high = pd.Timestamp(low).date(), pd.Timestamp(high).date()
+                selected = st.date_input(col_name, value=(low, high), min_value=low, max_value=high, key=f"filter_{col_name}")
+                if len(selected) != 2:
+                    return None
+            else:
+                # FLOAT/DOUBLE columns report no scale but still hold fractions
+                if str(column_info.data_type).upper() in FLOAT_TYPES or column_info.scale:
+                    low, high = float(low), float(high)
+                else:
+                    low, high = int(low), int(high)
+                selected = st.slider(col_name, min_value=low, max_value=high, value=(low, high), key=f"filter_{col_name}")
+            return tuple(selected) if tuple(selected) != (low, high) else None
+
+        if service.cardinality(col_name) <= LOW_CARDINALITY_LIMIT:
+            options = service.distinct_values(col_name, other_clauses)
+        else:
+            prefix = st.text_input(f"Search {col_name}", key=f"filter_search_{col_name}", placeholder="Type the start of a value")
+            if not prefix:
+                return None
+            options = service.search(col_name, prefix, other_clauses)
+
+        selected_val = st.selectbox(
+            label="",
+            options=[col_name] + [str(v) for v in options],
+            index=0,
+            key=f"filter_{col_name}",
+            placeholder=col_name
+        )
+        return selected_val if selected_val != col_name else None
 
+    @feature("viewer")
     def _view_data_with_pagination(self):
         if self.selected_table is None:
             st.warning("Please select a table first from the sidebar.")
             return
 
-        offset = st.session_state.get("pagination_offset", 0)
-        limit = 50
+        page = st.session_state.get("page_number", 0)
+        page_size = st.session_state.get("page_size", 50)
+        table_fqn = f"{self.selected_db}.{self.selected_schema}.{self.selected_table}"
 
         try:
-            col_query = f"""
-                SELECT column_name
-                FROM {self.selected_db}.information_schema.columns
-                WHERE table_name = UPPER('{self.selected_table}')
-                AND table_schema = UPPER('{self.selected_schema}')
-                ORDER BY ordinal_position
-            """
-            column_names = [col["COLUMN_NAME"] for col in self.session.sql(col_query).collect()]
+            table_schema = get_table_schema(self.session, self.selected_db, self.selected_schema, self.selected_table)
+            column_names = table_schema.column_names
         except Exception as e:
             st.error(f"Error fetching column names: {e}")
             return
 
         # Fetch filter values from session_state
         filter_values = st.session_state['filter_values']
-        filter_applied = False  # Flag to check if filter is applied
         col1, _ = st.columns([1, 3])
         with col1:
             selected_filter_columns = st.multiselect(
@@ -258,42 +308,49 @@ class SnowflakeDataApp:
                 options=column_names#,help="Choose columns to filter. Each one will display a dropdown of distinct values."
             )
 
+        # Drop filters whose column is no longer selected (or belongs to another table)
+        for col_name in list(filter_values):
+            if col_name not in selected_filter_columns:
+                del filter_values[col_name]
+
         if selected_filter_columns:
+            service = FilterValueService(self.session, table_schema)
+            columns_by_name = {col.name: col for col in table_schema.columns}
             filter_cols = st.columns(len(selected_filter_columns))
             for idx, col_name in enumerate(selected_filter_columns):
                 with filter_cols[idx]:
-                    distinct_vals = self._get_distinct_column_values(self.selected_schema, self.selected_table, col_name,self.selected_db)
-                    selected_val = st.selectbox(
-                        label="",
-                        options=[col_name] + [str(v) for v in distinct_vals],
-                        index=0,
-                        key=f"filter_{col_name}",
-                        placeholder=col_name
-                    )
-                    if selected_val != col_name:
+                    try:
+                        other_clauses = filter_clauses(filter_values, table_schema, exclude=col_name)
+                        selected_val = self._filter_widget(service, columns_by_name[col_name], other_clauses)
+                    except Exception as e:
+                        st.error(f"Error fetching values for {col_name}: {e}")
+                        selected_val = None
+                    if selected_val is not None:
                         filter_values[col_name] = selected_val
-                        filter_applied = True  # Mark that a filter has been applied
                     else:
                         if col_name in filter_values:
                             del filter_values[col_name]
 
         st.session_state['filter_values'] = filter_values
 
-        # Reset pagination to the first page when a filter is applied
-        if filter_applied:
-            st.session_state["pagination_offset"] = 0  # Reset pagination offset to 0 when filter is applied
+        # Reset pagination to the first page when the filter set changes
+        if st.session_state.get("active_filters") != (table_fqn, dict(filter_values)):
+            st.session_state["active_filters"] = (table_fqn, dict(filter_values))
+            page = st.session_state["page_number"] = 0
 
-        where_clauses = [f"{col} = '{val}'" for col, val in filter_values.items()]
-        where_sql = f"WHERE {' AND '.join(where_clauses)}" if where_clauses else ""
+        where_clauses = filter_clauses(filter_values, table_schema)
 
         try:
-            data_query = f"""
-                SELECT * FROM {self.selected_db}.{self.selected_schema}.{self.selected_table}
-                {where_sql}
-                LIMIT {limit} OFFSET {offset}
-            """
-            data = self.session.sql(data_query).collect()
-            df = pd.DataFrame(data, columns=column_names)
+            primary_key = table_schema.primary_key
+            total_rows = cached_row_count(self.session, table_schema, [])
+            filtered_rows = cached_row_count(self.session, table_schema, where_clauses) if where_clauses else total_rows
+            page_count = max(1, -(-filtered_rows // page_size))
+            page = min(page, page_count - 1)
+            pager = KeysetPager(
+                self.session, table_schema, where_clauses, page_size, cache=get_page_cache(), session_pool=get_session_pool()
+            )
+            df = pager.fetch(page)
+            pager.prefetch(page, page_count)
         except Exception as e:
             st.error(f"Error fetching data: {e}")
             return
@@ -302,9 +359,10 @@ class SnowflakeDataApp:
         df["✅ Delete"] = False
         df = df[["✅ Delete"] + column_names]
 
-        # Add empty row
-        empty_row = pd.DataFrame([[False] + [None] * len(column_names)], columns=["✅ Delete"] + column_names)
-        df_with_empty_row = pd.concat([df, empty_row], ignore_index=True).reset_index(drop=True)
+        # Add empty row (integer columns become nullable so the blank row keeps them integral)
+        nullable_ints = {col: "Int64" for col in column_names if pd.api.types.is_integer_dtype(df[col])}
+        df_with_empty_row = df.astype(nullable_ints).reset_index(drop=True).reindex(range(len(df) + 1))
+        df_with_empty_row["✅ Delete"] = df_with_empty_row["✅ Delete"].eq(True)
 
         st.markdown(
             """
@@ -323,102 +381,145 @@ class SnowflakeDataApp:
             df_with_empty_row,
             use_container_width=True,
             num_rows="fixed",
-            key=f"editor_{self.selected_table}_{offset}"
+            key=f"editor_{self.selected_table}_{page_size}_{page}"
         )
 
-        # Fetch metadata
-        column_metadata_query = f"""
-            SELECT COLUMN_NAME, DATA_TYPE, IS_NULLABLE
-            FROM {self.selected_db}.INFORMATION_SCHEMA.COLUMNS
-            WHERE TABLE_NAME = '{self.selected_table}' AND TABLE_SCHEMA = '{st.session_state["selected_schema"]}'
-        """
-        column_metadata = self.session.sql(column_metadata_query).collect()
+        # Rows are matched on the primary key, or on the first column when the table has none
+        key_columns = table_schema.primary_key or column_names[:1]
 
-        # Save changes
+        # Save changes: inserts, updates and ticked deletes as one transaction
         if st.button("💾 Save Changes"):
-            changes = 0
-            for i, row in edited_df.iterrows():
-                is_new_row = i >= len(df)
-                row_data = row[column_names]
-                has_data = row_data.notna().any()
-
-                if is_new_row and has_data:
-                    errors = self._validate_row(row_data, column_metadata, f"{self.selected_table}",f"{self.selected_schema}",f"{self.selected_db}")
-                    if errors:
-                        st.error(f"Row {i + 1} validation errors: {', '.join(errors)}")
-                    else:
-                        cols = ", ".join(column_names)
-                        vals = ", ".join([f"'{v}'" if pd.notna(v) else "NULL" for v in row_data])
-                        insert_query = f"INSERT INTO {self.selected_db}.{self.selected_schema}.{self.selected_table} ({cols}) VALUES ({vals})"
-                        self.session.sql(insert_query).collect()
-                        changes += 1
-                elif not is_new_row:
-                    updates = []
-                    for col in column_names:
-                        orig_val = df.iloc[i][col]
-                        new_val = row[col]
-                        if pd.isna(orig_val) and pd.isna(new_val):
-                            continue
-                        if orig_val != new_val:
-                            val = f"'{new_val}'" if pd.notna(new_val) else "NULL"
-                            updates.append(f"{col} = {val}")
-
-                    if updates:
-                        where_key = f"{column_names[0]} = '{df.iloc[i][column_names[0]]}'"
-                        update_query = f"""
-                            UPDATE {self.selected_db}.{self.selected_schema}.{self.selected_table}
-                            SET {', '.join(updates)}
-                            WHERE {where_key}
-                        """
-                        try:
-                            self.session.sql(update_query).collect()
-                            changes += 1
-                        except Exception as e:
-                            st.error(f"Update failed for row {i+1}: {e}")
-
-            if changes > 0:
-                st.success(f"✅ {changes} changes saved successfully.")
-                st.cache_data.clear()  # Ensure we clear the cache when saving changes
-                st.rerun()
-            else:
-                st.info("No changes detected.")
+            change_set = build_change_set(df, edited_df, column_names, key_columns, delete_column="✅ Delete")
+            self._apply_changes(change_set, table_schema)
 
         # ✅ Multi-row Deletion
         rows_to_delete = edited_df[edited_df["✅ Delete"] == True]
         if not rows_to_delete.empty:
             st.warning(f"Selected {len(rows_to_delete)} row(s) for deletion.")
             if st.button("🗑️ Delete Selected Rows"):
-                deleted = 0
-                for _, row in rows_to_delete.iterrows():
-                    try:
-                        pk_col = column_names[0]
-                        pk_val = row[pk_col]
-                        if pd.notna(pk_val):
-                            delete_query = f"""
-                                DELETE FROM {self.selected_db}.{self.selected_schema}.{self.selected_table}
-                                WHERE {pk_col} = '{pk_val}'
-                            """
-                            self.session.sql(delete_query).collect()
-                            deleted += 1
-                    except Exception as e:
-                        st.error(f"Delete failed for PK={pk_val}: {e}")
-                if deleted > 0:
-                    st.success(f"✅ {deleted} row(s) deleted.")
-                    st.cache_data.clear()
-                    st.rerun()
+                change_set = build_change_set(df, edited_df, column_names, key_columns, delete_column="✅ Delete", include_edits=False)
+                self._apply_changes(change_set, table_schema)
 
         # Pagination
         st.markdown("---")
-        col1, col2, _ = st.columns([1, 1, 8])
+        first_row = page * page_size + 1 if len(df) else 0
+        summary = f"Rows {first_row:,}–{page * page_size + len(df):,} of {filtered_rows:,}"
+        if where_clauses:
+            summary += f" (filtered from {total_rows:,})"
+        st.caption(f"{summary} · page {page + 1:,} of {page_count:,}" + ("" if primary_key else " · no primary key, ordered by all columns"))
+
+        col1, col2, col3, col4, _ = st.columns([1, 1, 2, 2, 4])
         with col1:
-            if st.button("⬅️ Prev") and offset > 0:
-                st.session_state["pagination_offset"] -= limit
+            if st.button("⬅️ Prev", disabled=page == 0):
+                st.session_state["page_number"] = page - 1
                 st.rerun()
         with col2:
-            if st.button("➡️ Next") and len(df) == limit:
-                st.session_state["pagination_offset"] += limit
+            if st.button("➡️ Next", disabled=page >= page_count - 1):
+                st.session_state["page_number"] = page + 1
+                st.rerun()
+        with col3:
+            jump_to = st.number_input("Go to page", min_value=1, max_value=page_count, value=page + 1, step=1)
+            if jump_to != page + 1:
+                st.session_state["page_number"] = int(jump_to) - 1
                 st.rerun()
+        with col4:
+            new_size = st.selectbox("Rows per page", PAGE_SIZES, index=PAGE_SIZES.index(page_size) if page_size in PAGE_SIZES else 1)
+            if new_size != page_size:
+                st.session_state["page_size"] = new_size
+                st.session_state["page_number"] = page * page_size // new_size
+                st.rerun()
+
+        self._export_widget(table_schema, where_clauses, filtered_rows, df[column_names])
+
+    @feature("export")
+    def _export_widget(self, table_schema, where_clauses, filtered_rows, sample):
+        with st.expander(f"📥 Export {'filtered ' if where_clauses else ''}rows ({filtered_rows:,})"):
+            label = st.radio("Format", list(EXPORT_FORMATS), horizontal=True, key="export_format")
+            fmt = EXPORT_FORMATS[label]
+            # The current page stands in for every row when sizing the export
+            estimated_bytes = estimate_export_bytes(sample, filtered_rows)
+            if fmt != "xlsx" and estimated_bytes > STAGE_EXPORT_THRESHOLD:
+                st.caption("Large export: unloaded on the server with COPY INTO and downloaded straight from a stage"
+                           + (" as gzipped CSV." if fmt == "csv" else "."))
+
+            export_key = (table_schema.fqn, tuple(where_clauses), fmt)
+            exported = st.session_state.get("export_file")
+            if st.button("📦 Prepare export", key="export_prepare"):
+                if exported is not None:
+                    exported[1].discard()
+                    exported = st.session_state["export_file"] = None
+                progress_bar = st.progress(0.0, text="Starting…")
+
+                def on_progress(progress):
+                    progress_bar.progress(
+                        progress.fraction,
+                        text=f"{progress.phase}: {progress.rows_written:,} of {progress.total_rows:,} rows"
+                        if progress.rows_written else f"{progress.phase}…",
+                    )
+
+                try:
+                    export_file = export_table(
+                        self.session, table_schema, where_clauses, fmt, filtered_rows, estimated_bytes, on_progress
+                    )
+                except ExportTooLargeError as e:
+                    progress_bar.empty()
+                    st.error(f"❌ {e}")
+                    return
+                except Exception as e:
+                    progress_bar.empty()
+                    st.error(f"❌ Export failed: {e}")
+                    return
+                progress_bar.progress(1.0, text=f"Done: {export_file.rows:,} rows in {export_file.elapsed:.1f}s")
+                exported = st.session_state["export_file"] = (export_key, export_file)
+
+            if exported is not None and exported[0] == export_key:
+                export_file = exported[1]
+                if export_file.url:
+                    st.link_button(f"⬇️ Download {export_file.file_name}", export_file.url)
+                    st.caption(f"The link is valid for {PRESIGNED_URL_EXPIRY // 60} minutes.")
+                else:
+                    # A callable is only read when the button is clicked, not on every rerun
+                    st.download_button(
+                        f"⬇️ Download {export_file.file_name}",
+                        export_file.read,
+                        file_name=export_file.file_name,
+                        mime=export_file.mime,
+                        on_click="ignore",
+                        key="export_download",
+                    )
+
+    @feature("insert")
+    def _apply_changes(self, change_set, table_schema):
+        if change_set.is_empty():
+            st.info("No changes detected.")
+            return
+
+        # Validate everything first: the change set is written completely or not at all
+        errors = self._validate_rows(change_set.inserts, table_schema)
+        update_errors = validate_frame(change_set.updates, compile_checks(table_schema.column_metadata)).messages
+        for i, row_errors in sorted(errors.items()):
+            st.error(f"Row {i + 1} validation errors: {', '.join(row_errors)}")
+        for i, row_errors in sorted(update_errors.items()):
+            st.error(f"Row {i + 1} validation errors: {', '.join(row_errors)}")
+        if errors or update_errors:
+            st.error("❌ Nothing was saved. Fix the rows above and try again.")
+            return
+
+        try:
+            summary = apply_change_set(self.session, change_set, table_schema)
+        except NullKeyError as e:
+            key_note = "" if table_schema.primary_key else " The table has no primary key, so rows are matched on its first column."
+            st.error(f"❌ Nothing was saved. {e}{key_note}")
+            return
+        except Exception as e:
+            st.error(f"❌ Save failed, no changes were applied: {e}")
+            return
+        st.success(f"✅ Changes saved: {summary}.")
+        if summary.inserted or summary.updated or summary.deleted:
+            invalidate_table(table_schema.fqn)
+        st.rerun()
 
+    @feature("insert")
     def _upload_file(self):
         st.subheader("📤 Upload Data from File")
         selected_table = st.session_state.get("selected_table")
@@ -430,47 +531,325 @@ class SnowflakeDataApp:
             return
 
         if file:
+            load_mode = st.radio(
+                "Load mode",
+                options=["Bulk insert", "Bulk merge (upsert)", "Row by row"],
+                horizontal=True,
+                key="upload_load_mode",
+            )
+            streaming = st.toggle(
+                "Stream in chunks (large files)",
+                value=file.size > STREAMING_THRESHOLD,
+                key="upload_streaming",
+                help="Reads, validates and stages the file chunk by chunk and previews only a sample.",
+            )
+            background = st.toggle(
+                "Run in background",
+                key="upload_background",
+                help="Queues the upload as a job that keeps running if you navigate away or close the tab.",
+                # Inside Snowflake a job would share the one session the app runs on
+                disabled=get_session_pool().shared_session,
+            )
+            streaming = streaming or background
+            if streaming and load_mode == "Row by row":
+                st.info("Streaming always loads in bulk; row-by-row mode is ignored.")
+                load_mode = "Bulk insert"
             try:
-                if file.name.endswith(".csv"):
-                    df = pd.read_csv(file)
-                    df.columns =df.columns = df.columns.str.strip().str.upper()
+                if streaming:
+                    self._streaming_upload(file, selected_table, load_mode, background)
+
+                elif file.name.endswith(".csv"):
+                    table_schema = get_table_schema(self.session, self.selected_db, self.selected_schema, selected_table)
+                    df, parse_report = parse_csv(file, table_schema)
                     st.dataframe(df, use_container_width=True)
+                    st.caption(
+                        f"Parsed {parse_report.rows:,} rows in {parse_report.seconds:.2f}s on {parse_report.threads} threads · "
+                        f"{parse_report.memory_bytes / 1024 / 1024:,.1f} MB in memory, "
+                        f"{parse_report.memory_saved / 1024 / 1024:,.1f} MB less than untyped parsing (estimated)."
+                    )
+                    if parse_report.text_fallback_columns:
+                        st.info(f"Kept as text because some values do not fit the column type: {', '.join(parse_report.text_fallback_columns)}.")
 
+                    merge_keys = self._merge_key_picker(load_mode, df.columns, "csv")
                     if st.button("⬆️ Insert Uploaded CSV Data"):
-                        self._insert_uploaded_data(df, selected_table)
+                        self._insert_uploaded_data(df, selected_table, load_mode, merge_keys)
 
                 elif file.name.endswith(".xlsx"):
                     excel_file = pd.ExcelFile(file)
                     sheet_names = excel_file.sheet_names
 
                     selected_sheets = st.multiselect("Select sheet(s) to upload", sheet_names)
+                    # With several sheets only a bounded preview of each is read on every rerun
+                    many_sheets = len(selected_sheets) > 1
+                    if many_sheets:
+                        self._ingest_all_sheets(file, selected_sheets, selected_table, load_mode)
 
                     for sheet in selected_sheets:
                         st.markdown(f"### 📄 Sheet: {sheet}")
-                        sheet_df = excel_file.parse(sheet)
-                        sheet_df.columns = sheet_df.columns.str.strip().str.upper()
+                        if many_sheets:
+                            sheet_df = preview_xlsx(file, sheet)
+                            st.caption(f"Preview of the first {len(sheet_df):,} rows.")
+                        else:
+                            sheet_df = self._parse_sheet(excel_file, sheet)
                         st.dataframe(sheet_df, use_container_width=True)
 
+                        merge_keys = self._merge_key_picker(load_mode, sheet_df.columns, sheet)
                         if st.button(f"⬆️ Insert Data from {sheet}", key=f"upload_{sheet}"):
-                            self._insert_uploaded_data(sheet_df, selected_table)
+                            if many_sheets:
+                                sheet_df = self._parse_sheet(excel_file, sheet)
+                            self._insert_uploaded_data(sheet_df, selected_table, load_mode, merge_keys)
 
             except Exception as e:
                 st.error(f"❌ Error processing file: {e}")
 
-    def _insert_uploaded_data(self, df, selected_table):
-        # Fetch column metadata from Snowflake
-        column_metadata_query = f"""
-            SELECT COLUMN_NAME, DATA_TYPE, IS_NULLABLE
-            FROM {st.session_state["selected_db"]}.INFORMATION_SCHEMA.COLUMNS
-            WHERE TABLE_NAME = '{selected_table}' AND TABLE_SCHEMA = '{st.session_state["selected_schema"]}'
-        """
-        column_metadata = self.session.sql(column_metadata_query).collect()
+    @staticmethod
+    def _parse_sheet(excel_file, sheet):
+        sheet_df = excel_file.parse(sheet)
+        sheet_df.columns = sheet_df.columns.str.strip().str.upper()
+        return sheet_df
+
+    def _streaming_upload(self, file, selected_table, load_mode, background=False):
+        if file.name.endswith(".csv"):
+            sheets = {"csv": None}
+            previews = {"csv": preview_csv(file)}
+        else:
+            selected_sheets = st.multiselect("Select sheet(s) to upload", xlsx_sheet_names(file))
+            sheets = {sheet: sheet for sheet in selected_sheets}
+            previews = {sheet: preview_xlsx(file, sheet) for sheet in selected_sheets}
+            if len(selected_sheets) > 1 and not background:
+                self._ingest_all_sheets(file, selected_sheets, selected_table, load_mode)
+
+        for name, preview in previews.items():
+            if name != "csv":
+                st.markdown(f"### 📄 Sheet: {name}")
+            st.caption(f"Preview of the first {len(preview):,} rows of a {file.size / 1024 / 1024:,.1f} MB file.")
+            st.dataframe(preview, use_container_width=True)
+
+            merge_keys = self._merge_key_picker(load_mode, preview.columns, f"stream_{name}")
+            label = "⬆️ Stream Uploaded CSV Data" if name == "csv" else f"⬆️ Stream Data from {name}"
+            if background:
+                label = "⏳ Queue Uploaded CSV Data" if name == "csv" else f"⏳ Queue Data from {name}"
+            if st.button(label, key=f"stream_upload_{name}"):
+                if load_mode == "Bulk merge (upsert)" and not merge_keys:
+                    st.error("❌ Choose at least one column to match rows on.")
+                elif background:
+                    self._submit_upload_job(file, sheets[name], selected_table, load_mode, merge_keys)
+                elif sheets[name] is None:
+                    self._run_streaming_ingest(read_csv_chunks(file), selected_table, load_mode, merge_keys)
+                else:
+                    self._run_streaming_ingest(read_xlsx_chunks(file, sheets[name]), selected_table, load_mode, merge_keys)
+
+    def _ingest_all_sheets(self, file, selected_sheets, selected_table, load_mode):
+        """Offer one button that parses, validates and loads every selected sheet in parallel."""
+        table_schema = get_table_schema(self.session, self.selected_db, self.selected_schema, selected_table)
+        if load_mode == "Row by row":
+            load_mode = "Bulk insert"
+        merge_keys = self._merge_key_picker(load_mode, table_schema.column_names, "all_sheets")
+        if not st.button(f"⬆️ Ingest all {len(selected_sheets)} selected sheets", key="upload_all_sheets"):
+            return
+        if load_mode == "Bulk merge (upsert)" and not merge_keys:
+            st.error("❌ Choose at least one column to match rows on.")
+            return
+
+        status = st.status(f"Ingesting {len(selected_sheets)} sheets…", expanded=True)
+        path = spool_upload(file)
+        try:
+            reports = ingest_sheets(path, selected_sheets, table_schema, get_session_pool(), merge_keys=merge_keys)
+        except Exception as e:
+            status.update(label="Sheet ingest failed", state="error")
+            st.error(f"❌ Error ingesting sheets: {e}")
+            return
+        finally:
+            os.unlink(path)
+
+        with status:
+            st.dataframe(report_frame(reports), use_container_width=True, hide_index=True)
+            for report in reports:
+                if report.errors:
+                    with st.expander(f"❌ {report.sheet}: {report.rejected:,} rows rejected"):
+                        st.text("\n".join(report.errors[:MAX_REPORTED_ERRORS]))
+        failed = [r.sheet for r in reports if r.status != "loaded"]
+        status.update(
+            label=f"Ingested {len(reports) - len(failed)} of {len(reports)} sheets",
+            state="error" if failed else "complete",
+        )
+        if any(r.inserted or r.updated for r in reports):
+            invalidate_table(table_schema.fqn)
+            st.success(
+                f"✅ {sum(r.inserted for r in reports):,} rows inserted, "
+                f"{sum(r.updated for r in reports):,} rows updated across {len(reports) - len(failed)} sheets."
+            )
+        else:
+            st.info("No new data inserted.")
+
+    def _session_owner(self):
+        """Key of this user's pooled session and upload jobs: the signed-in email, else one per browser session."""
+        user = self._current_user()
+        if user != "User":
+            return user
+        return f"anonymous:{st.session_state['browser_session_id'][:8]}"
+
+    def _current_user(self):
+        try:
+            email = st.user.get("email")
+        except Exception:
+            email = None
+        return email or st.session_state["username"]
+
+    def _submit_upload_job(self, file, sheet_name, selected_table, load_mode, merge_keys):
+        table_schema = get_table_schema(self.session, self.selected_db, self.selected_schema, selected_table)
+        try:
+            job = get_job_manager().submit(
+                self._session_owner(),
+                get_session_pool(),
+                table_schema,
+                file,
+                sheet_name=sheet_name,
+                merge_keys=merge_keys if load_mode == "Bulk merge (upsert)" else None,
+            )
+        except JobLimitError as e:
+            st.warning(f"⏳ {e} Wait for it to finish or cancel it below.")
+            return
+        st.success(f"⏳ Upload job {job.id} queued. Follow its progress under Upload Jobs.")
+
+    def _upload_jobs_panel(self):
+        manager = get_job_manager()
+        # Same identity as the pooled session, so anonymous visitors only see their own jobs
+        user = self._session_owner()
+        jobs = manager.jobs_for(user)
+        if not jobs:
+            return
+
+        @st.fragment(run_every=2 if any(job.active for job in jobs) else None)
+        def panel():
+            st.markdown("### ⏳ Upload Jobs")
+            acknowledged = st.session_state.setdefault("acknowledged_jobs", set())
+            for job in manager.jobs_for(user):
+                if job.status == "succeeded" and job.id not in acknowledged:
+                    if job.rows_loaded or job.rows_updated:
+                        invalidate_table(job.table_fqn)
+                    acknowledged.add(job.id)
+
+                icon = {"queued": "🕒", "running": "🔄", "succeeded": "✅", "failed": "❌", "cancelled": "🚫"}[job.status]
+                col1, col2 = st.columns([6, 1])
+                with col1:
+                    st.markdown(f"{icon} **{job.id}** · {job.source} → `{job.table_fqn}` · {job.status}")
+                    text = (
+                        f"{job.rows_read:,} rows read · {job.rows_rejected:,} rejected · "
+                        f"{job.rows_per_second:,.0f} rows/s"
+                    )
+                    if job.status == "succeeded":
+                        text += f" · {job.rows_loaded:,} inserted"
+                        if job.rows_updated:
+                            text += f", {job.rows_updated:,} updated"
+                    st.progress(job.fraction if job.active else 1.0, text=text)
+                    if job.message:
+                        st.caption(job.message)
+                    if job.errors:
+                        with st.expander(f"{job.rows_rejected:,} rows rejected"):
+                            st.text("\n".join(job.errors))
+                with col2:
+                    if job.active and st.button("Cancel", key=f"cancel_job_{job.id}"):
+                        job.cancel()
+                        st.rerun(scope="fragment")
+
+        panel()
+
+    @feature("insert")
+    def _run_streaming_ingest(self, chunks, selected_table, load_mode, merge_keys):
+        table_schema = get_table_schema(self.session, self.selected_db, self.selected_schema, selected_table)
+        progress_bar = st.progress(0.0, text="Starting…")
+
+        def on_progress(progress):
+            progress_bar.progress(
+                progress.fraction,
+                text=(
+                    f"{progress.rows_read:,} rows read · {progress.rows_rejected:,} rejected · "
+                    f"{progress.rows_per_second:,.0f} rows/s"
+                ),
+            )
+
+        try:
+            result, progress = ingest_chunks(
+                self.session,
+                chunks,
+                table_schema,
+                merge_keys=merge_keys if load_mode == "Bulk merge (upsert)" else None,
+                on_progress=on_progress,
+            )
+        except Exception as e:
+            st.error(f"❌ Streaming load failed, nothing was written: {e}")
+            return
+
+        progress_bar.progress(1.0, text=f"Done: {progress.rows_read:,} rows in {progress.elapsed:.1f}s")
+        if progress.errors:
+            with st.expander(f"❌ {progress.rows_rejected:,} rows rejected"):
+                st.text("\n".join(progress.errors))
+                if progress.rows_rejected > len(progress.errors):
+                    st.caption(f"Showing the first {len(progress.errors):,} errors.")
+        if result.rows_loaded or result.rows_updated:
+            invalidate_table(table_schema.fqn)
+            st.success(
+                f"✅ {result.rows_loaded:,} rows inserted"
+                + (f", {result.rows_updated:,} rows updated" if result.rows_updated else "")
+                + f" in {progress.elapsed:.1f}s ({progress.rows_per_second:,.0f} rows/s)."
+            )
+        else:
+            st.info("No new data inserted.")
+
+    def _merge_key_picker(self, load_mode, columns, key):
+        if load_mode != "Bulk merge (upsert)":
+            return None
+        table_schema = get_table_schema(self.session, self.selected_db, self.selected_schema, self.selected_table)
+        default = [col for col in table_schema.primary_key if col in columns] or list(columns[:1])
+        return st.multiselect(
+            "Match rows on",
+            options=list(columns),
+            default=default,
+            key=f"merge_keys_{key}",
+        )
+
+    @feature("insert")
+    def _insert_uploaded_data(self, df, selected_table, load_mode="Bulk insert", merge_keys=None):
+        table_schema = get_table_schema(self.session, self.selected_db, self.selected_schema, selected_table)
 
         changes = 0
-        for _, row in df.iterrows():
-            # Validate the row using the _validate_row method
-            #st.write(row)
-            errors = self._validate_row(row, column_metadata, f"{selected_table}",f"{self.selected_schema}",f"{self.selected_db}")
+        row_errors = self._validate_rows(df, table_schema)
+
+        if load_mode != "Row by row":
+            for errors in row_errors.values():
+                for error in errors:
+                    st.error(f"❌ {error}")
+            valid_rows = df.drop(index=list(row_errors))
+            if valid_rows.empty:
+                st.info("No new data inserted.")
+                return
+            if load_mode == "Bulk merge (upsert)" and not merge_keys:
+                st.error("❌ Choose at least one column to match rows on.")
+                return
+            try:
+                result = bulk_load(
+                    self.session,
+                    valid_rows,
+                    self.selected_db,
+                    self.selected_schema,
+                    selected_table,
+                    merge_keys=merge_keys if load_mode == "Bulk merge (upsert)" else None,
+                )
+            except Exception as e:
+                st.error(f"❌ Bulk load failed, nothing was written: {e}")
+                return
+            if result.rows_loaded or result.rows_updated:
+                invalidate_table(table_schema.fqn)
+            st.success(
+                f"✅ {result.rows_loaded} rows inserted"
+                + (f", {result.rows_updated} rows updated" if result.rows_updated else "")
+                + f" in {result.elapsed:.1f}s ({result.rows_per_second:,.0f} rows/s)."
+            )
+            return
+
+        for idx, row in df.iterrows():
+            errors = row_errors.get(idx)
 
             # If there are validation errors, show them and skip inserting the row
             if errors:
@@ -479,16 +858,19 @@ class SnowflakeDataApp:
                 continue
 
             # If no errors, insert the data
-            cols = ", ".join(df.columns)
-            vals = ", ".join([f"'{str(v)}'" if pd.notna(v) else "NULL" for v in row])
-            insert_query = f"INSERT INTO {self.selected_db}.{self.selected_schema}.{selected_table} ({cols}) VALUES ({vals})"
+            insert_query = Sql(
+                f"INSERT INTO {table_schema.sql_name} ({', '.join(ident(col) for col in df.columns)}) "
+                f"VALUES ({', '.join(['?'] * len(df.columns))})",
+                tuple(bind_value(v) for v in row),
+            )
             try:
-                self.session.sql(insert_query).collect()
+                run(self.session, insert_query).collect()
                 changes += 1
             except Exception as e:
                 st.error(f"❌ Error inserting row: {e}")
 
         if changes > 0:
+            invalidate_table(table_schema.fqn)
             st.success(f"✅ {changes} rows saved successfully.")
         else:
             st.info("No new data inserted.")
@@ -508,11 +890,18 @@ class SnowflakeDataApp:
 
         with tabs[1]:
             self._upload_file()
+            self._upload_jobs_panel()
 
 def main():
     app = SnowflakeDataApp()
-    app._sidebar()
-    app.app_tabs()
+    try:
+        app._sidebar()
+        app.app_tabs()
+        if st.session_state.get("query_debug"):
+            render_debug_panel(get_query_log())
+    finally:
+        # Also runs when the rerun ends early through st.stop() or st.rerun()
+        app.close()
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,328 @@
+"""In-process stand-in for a Snowflake account, backed by DuckDB.
+
+``FakeWarehouse`` holds the databases; ``FakeWarehouse.session()`` returns
+an object with the parts of the Snowpark ``Session`` API the app uses:
+``sql(query, params).collect()`` / ``to_pandas()``, ``write_pandas``,
+``query_history``, ``query_tag`` and ``close``. Snowflake-only syntax is
+translated before it reaches DuckDB:
+
+- ``SHOW DATABASES``, ``SHOW TABLES IN db.schema`` and
+  ``SHOW PRIMARY KEYS IN TABLE db.schema.table`` are answered from the
+  DuckDB catalog,
+- ``db.INFORMATION_SCHEMA.{COLUMNS,TABLES,SCHEMATA}`` become table macros
+  that report Snowflake type names and a ``LAST_ALTERED`` the fake keeps
+  up to date on every write,
+- ``IFF``, ``EQUAL_NULL`` and ``NUMBER(p,s)`` / ``TIMESTAMP_NTZ`` casts are
+  mapped onto DuckDB equivalents,
+- DML returns the ``number of rows inserted/updated/deleted`` counters.
+
+Every statement is counted on the warehouse, which is what the benchmarks
+report as "queries".
+"""
+import re
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from dataclasses import dataclass
+from datetime import datetime
+
+import duckdb
+import pandas as pd
+from snowflake.snowpark import Row
+
+_MACROS = """
+CREATE MACRO IFF(cond, a, b) AS CASE WHEN cond THEN a ELSE b END;
+CREATE MACRO EQUAL_NULL(a, b) AS a IS NOT DISTINCT FROM b;
+CREATE TABLE sf_tables (db VARCHAR, sch VARCHAR, name VARCHAR, last_altered TIMESTAMP, temporary BOOLEAN);
+CREATE MACRO SF_SCHEMATA(db) AS TABLE
+    SELECT schema_name AS SCHEMA_NAME
+    FROM duckdb_schemas() WHERE database_name = db AND NOT internal;
+CREATE MACRO SF_TABLES(db) AS TABLE
+    SELECT t.schema_name AS TABLE_SCHEMA, t.table_name AS TABLE_NAME, 'BASE TABLE' AS TABLE_TYPE,
+           t.estimated_size AS ROW_COUNT, COALESCE(m.last_altered, TIMESTAMP '2000-01-01') AS LAST_ALTERED
+    FROM duckdb_tables() t
+    LEFT JOIN sf_tables m ON m.db = t.database_name AND m.sch = t.schema_name AND m.name = t.table_name
+    WHERE t.database_name = db
+    UNION ALL
+    SELECT schema_name, view_name, 'VIEW', NULL, TIMESTAMP '2000-01-01'
+    FROM duckdb_views() WHERE database_name = db AND NOT internal;
+CREATE MACRO SF_COLUMNS(db) AS TABLE
+    SELECT schema_name AS TABLE_SCHEMA, table_name AS TABLE_NAME, column_name AS COLUMN_NAME,
+           column_index AS ORDINAL_POSITION,
+           CASE
+               WHEN data_type IN ('TINYINT', 'SMALLINT', 'INTEGER', 'BIGINT', 'HUGEINT') OR data_type LIKE 'DECIMAL%' THEN 'NUMBER'
+               WHEN data_type IN ('FLOAT', 'DOUBLE', 'REAL') THEN 'FLOAT'
+               WHEN data_type = 'VARCHAR' THEN 'TEXT'
+               WHEN data_type = 'TIMESTAMP' THEN 'TIMESTAMP_NTZ'
+               WHEN data_type = 'TIMESTAMP WITH TIME ZONE' THEN 'TIMESTAMP_TZ'
+               ELSE data_type
+           END AS DATA_TYPE,
+           CASE WHEN is_nullable THEN 'YES' ELSE 'NO' END AS IS_NULLABLE,
+           CASE WHEN data_type = 'VARCHAR' THEN 16777216 END AS CHARACTER_MAXIMUM_LENGTH,
+           CASE WHEN data_type LIKE 'DECIMAL%' THEN numeric_precision
+                WHEN data_type IN ('TINYINT', 'SMALLINT', 'INTEGER', 'BIGINT', 'HUGEINT') THEN 38 END AS NUMERIC_PRECISION,
+           CASE WHEN data_type LIKE 'DECIMAL%' THEN numeric_scale
+                WHEN data_type IN ('TINYINT', 'SMALLINT', 'INTEGER', 'BIGINT', 'HUGEINT') THEN 0 END AS NUMERIC_SCALE
+    FROM duckdb_columns() WHERE database_name = db;
+"""
+
+# A plain or double-quoted identifier; the name is captured without quotes.
+_NAME = r'(?<![\w"])"?([\w$]+)"?'
+
+_REWRITES = [
+    (re.compile(rf"{_NAME}\.INFORMATION_SCHEMA\.(COLUMNS|TABLES|SCHEMATA)\b", re.I), lambda m: f"SF_{m[2].upper()}('{m[1]}')"),
+    (re.compile(r"\bNUMBER\s*\(", re.I), lambda m: "DECIMAL("),
+    (re.compile(r"::NUMBER\b", re.I), lambda m: "::DECIMAL(38,0)"),
+    (re.compile(r"\bTIMESTAMP_NTZ\b", re.I), lambda m: "TIMESTAMP"),
+    (re.compile(r"\bTIMESTAMP_[LT]Z\b", re.I), lambda m: "TIMESTAMPTZ"),
+]
+
+_SHOW_TABLES = re.compile(rf"SHOW\s+TABLES\s+IN\s+(?:SCHEMA\s+)?{_NAME}\.{_NAME}", re.I)
+_SHOW_PRIMARY_KEYS = re.compile(rf"SHOW\s+PRIMARY\s+KEYS\s+IN\s+TABLE\s+{_NAME}\.{_NAME}\.{_NAME}", re.I)
+_DML_TARGET = re.compile(
+    r"^\s*(INSERT\s+INTO|MERGE\s+INTO|UPDATE|DELETE\s+FROM|CREATE\s+(?:OR\s+REPLACE\s+)?TABLE|ALTER\s+TABLE)\s+"
+    rf"{_NAME}\.{_NAME}\.{_NAME}",
+    re.I,
+)
+_INTERNAL_DATABASES = ("memory", "system", "temp")
+
+
+def translate(query):
+    for pattern, replacement in _REWRITES:
+        query = pattern.sub(replacement, query)
+    return query
+
+
+@dataclass
+class FakeQueryRecord:
+    query_id: str
+    sql_text: str
+
+
+class _QueryHistory:
+    def __init__(self, session):
+        self.session = session
+        self.queries = []
+
+    def __enter__(self):
+        self.session._listeners.append(self)
+        return self
+
+    def __exit__(self, *exc):
+        self.session._listeners.remove(self)
+
+
+class FakeDataFrame:
+    def __init__(self, session, query, params=None):
+        self._session = session
+        self._query = query
+        self._params = params
+
+    def collect(self):
+        columns, rows = self._session._execute(self._query, self._params)
+        return [Row(**dict(zip(columns, values))) for values in rows]
+
+    def to_pandas(self):
+        return self._session._execute(self._query, self._params, as_frame=True)
+
+    def to_pandas_batches(self):
+        yield self.to_pandas()
+
+
+class FakeSession:
+    def __init__(self, warehouse):
+        self.warehouse = warehouse
+        self.connection = warehouse.connection.cursor()
+        self.query_tag = None
+        self._listeners = []
+        self.closed = False
+
+    def sql(self, query, params=None):
+        return FakeDataFrame(self, query, params)
+
+    def query_history(self):
+        return _QueryHistory(self)
+
+    def close(self):
+        if not self.closed:
+            self.closed = True
+            self.connection.close()
+
+    def write_pandas(self, df, table_name, database=None, schema=None, auto_create_table=False,
+                     table_type="", quote_identifiers=True, overwrite=False, **kwargs):
+        target = f'{database}.{schema}."{table_name}"'
+        self.connection.register("__write_pandas", df)
+        try:
+            exists = self.warehouse.table_exists(database, schema, table_name)
+            if overwrite and exists:
+                self.connection.execute(f"DROP TABLE {target}")
+                exists = False
+            if exists:
+                self._execute(f"INSERT INTO {target} BY NAME SELECT * FROM __write_pandas")
+            elif auto_create_table:
+                self._execute(f"CREATE TABLE {target} AS SELECT * FROM __write_pandas")
+                self.warehouse.touch(database, schema, table_name, temporary=table_type == "temporary")
+            else:
+                raise duckdb.CatalogException(f"Table {target} does not exist")
+        finally:
+            self.connection.unregister("__write_pandas")
+        return target
+
+    def _row_count(self, target):
+        # On this session's own connection, so rows written by an open transaction count.
+        return self.connection.execute(f'SELECT COUNT(*) FROM "{target[2]}"."{target[3]}"."{target[4]}"').fetchone()[0]
+
+    def _execute(self, query, params=None, as_frame=False):
+        self.warehouse.record(query)
+        for listener in self._listeners:
+            listener.queries.append(FakeQueryRecord(uuid.uuid4().hex, query))
+
+        statement = query.strip().rstrip(";")
+        keyword = statement.split(None, 1)[0].upper()
+        if keyword == "SHOW":
+            columns, rows = self.warehouse.show(statement)
+            if as_frame:
+                return pd.DataFrame(rows, columns=columns)
+            return columns, rows
+
+        target = _DML_TARGET.match(statement)
+        before = self._row_count(target) if keyword == "MERGE" and target else None
+        cursor = self.connection.execute(translate(statement), params)
+        if target:
+            self.warehouse.touch(target[2], target[3], target[4])
+
+        if keyword in ("INSERT", "MERGE", "UPDATE", "DELETE"):
+            affected = cursor.fetchone()[0]
+            if keyword == "MERGE":
+                inserted = self._row_count(target) - before
+                counters = {"number of rows inserted": inserted, "number of rows updated": affected - inserted}
+            else:
+                label = {"INSERT": "inserted", "UPDATE": "updated", "DELETE": "deleted"}[keyword]
+                counters = {f"number of rows {label}": affected}
+            return list(counters), [tuple(counters.values())]
+
+        if cursor.description is None:
+            return [], []
+        if as_frame:
+            frame = cursor.fetchdf()
+            frame.columns = [c.upper() for c in frame.columns]
+            return frame
+        columns = [d[0].upper() for d in cursor.description]
+        return columns, cursor.fetchall()
+
+
+class FakeWarehouse:
+    """A DuckDB database standing in for a Snowflake account."""
+
+    def __init__(self):
+        self.connection = duckdb.connect()
+        self.connection.execute(_MACROS)
+        self.query_count = 0
+        self.queries = []
+        self._lock = threading.Lock()
+
+    def session(self):
+        return FakeSession(self)
+
+    def create_database(self, name, schemas=("PUBLIC",)):
+        self.connection.execute(f"ATTACH ':memory:' AS {name}")
+        for schema in schemas:
+            self.connection.execute(f"CREATE SCHEMA {name}.{schema}")
+
+    def execute(self, statement):
+        """Run setup SQL without counting it as an app query."""
+        self.connection.execute(translate(statement))
+        target = _DML_TARGET.match(statement)
+        if target:
+            self.touch(target[2], target[3], target[4])
+
+    def record(self, query):
+        with self._lock:
+            self.query_count += 1
+            self.queries.append(" ".join(query.split()))
+
+    def reset_counters(self):
+        with self._lock:
+            self.query_count = 0
+            self.queries = []
+
+    def table_exists(self, db, schema, name):
+        return bool(self.connection.cursor().execute(
+            "SELECT 1 FROM duckdb_tables() WHERE database_name = ? AND schema_name = ? AND table_name = ?",
+            [db, schema, name],
+        ).fetchall())
+
+    def touch(self, db, schema, name, temporary=None):
+        cursor = self.connection.cursor()
+        with self._lock:
+            updated = cursor.execute(
+                """
+                UPDATE sf_tables SET last_altered = ?, temporary = COALESCE(?, temporary)
+                WHERE db = ? AND sch = ? AND name = ? RETURNING 1
+                """,
+                [_now(), temporary, db, schema, name],
+            ).fetchall()
+            if not updated:
+                cursor.execute(
+                    "INSERT INTO sf_tables VALUES (?, ?, ?, ?, ?)", [db, schema, name, _now(), bool(temporary)]
+                )
+
+    def show(self, statement):
+        cursor = self.connection.cursor()
+        if re.match(r"SHOW\s+DATABASES", statement, re.I):
+            rows = cursor.execute(
+                "SELECT database_name FROM duckdb_databases() WHERE database_name NOT IN (?, ?, ?) ORDER BY 1",
+                list(_INTERNAL_DATABASES),
+            ).fetchall()
+            return ["name"], rows
+        match = _SHOW_TABLES.match(statement)
+        if match:
+            rows = cursor.execute(
+                """
+                SELECT t.table_name, t.estimated_size FROM duckdb_tables() t
+                LEFT JOIN sf_tables m ON m.db = t.database_name AND m.sch = t.schema_name AND m.name = t.table_name
+                WHERE t.database_name = ? AND t.schema_name = ? AND NOT COALESCE(m.temporary, FALSE)
+                ORDER BY 1
+                """,
+                [match[1], match[2]],
+            ).fetchall()
+            return ["name", "rows"], rows
+        match = _SHOW_PRIMARY_KEYS.match(statement)
+        if match:
+            keys = cursor.execute(
+                """
+                SELECT constraint_column_names FROM duckdb_constraints()
+                WHERE database_name = ? AND schema_name = ? AND table_name = ? AND constraint_type = 'PRIMARY KEY'
+                """,
+                [match[1], match[2], match[3]],
+            ).fetchall()
+            columns = keys[0][0] if keys else []
+            return ["column_name", "key_sequence"], [(col, i + 1) for i, col in enumerate(columns)]
+        raise duckdb.ParserException(f"Unsupported SHOW statement in fake warehouse: {statement}")
+
+
+_clock = {"last": 0.0}
+_clock_lock = threading.Lock()
+
+
+def _now():
+    # Strictly increasing, so two writes in the same microsecond still move LAST_ALTERED.
+    with _clock_lock:
+        _clock["last"] = max(time.time(), _clock["last"] + 1e-6)
+        return datetime.fromtimestamp(_clock["last"])
+
+
+@contextmanager
+def patched_session_pool(warehouse):
+    """Make ``snowflake_connector.get_session_pool`` hand out sessions on ``warehouse``."""
+    import snowflake_connector
+
+    pool = snowflake_connector.SessionPool(warehouse.session)
+    original = snowflake_connector.get_session_pool
+    snowflake_connector.get_session_pool = lambda: pool
+    try:
+        yield pool
+    finally:
+        snowflake_connector.get_session_pool = original
+        pool.close_all()
@@ -0,0 +1,296 @@
+"""Offline benchmarks for the PRISM master data app.
+
+Drives ``app.py`` through Streamlit's ``AppTest`` against the DuckDB-backed
+``fake_snowflake`` warehouse, and calls the save and upload paths directly,
+recording for each interaction how many queries reached the warehouse and
+the median wall time over ``--repeat`` runs::
+
+    python benchmarks/run_benchmarks.py                      # compare with the baselines
+    python benchmarks/run_benchmarks.py --update-baseline    # accept the current numbers
+    python benchmarks/run_benchmarks.py --sizes 1000 100000  # skip the 1M-row upload
+
+The run fails (exit code 1) when any interaction issues more queries than
+the committed ``baseline.json``. Query counts do not depend on the machine,
+so they are always compared. Timings do, so ``baseline.json`` holds none:
+``--update-baseline`` also records this machine's timings in the untracked
+``timings.local.json``, and only when that file exists does the run also
+fail on interactions slower than it by more than ``--tolerance``
+(relative) plus ``--slack`` seconds.
+"""
+import argparse
+import io
+import json
+import logging
+import os
+import statistics
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+REPO = os.path.dirname(HERE)
+sys.path[:0] = [REPO, HERE]
+
+from streamlit.testing.v1 import AppTest  # noqa: E402
+
+from catalog_search import get_catalog_index  # noqa: E402
+from change_set import apply_change_set, build_change_set  # noqa: E402
+from fake_snowflake import FakeWarehouse, patched_session_pool  # noqa: E402
+from streaming_ingest import ingest_chunks, read_csv_chunks  # noqa: E402
+from table_schema import load_table_schema  # noqa: E402
+
+BASELINE = os.path.join(HERE, "baseline.json")
+LOCAL_TIMINGS = os.path.join(HERE, "timings.local.json")
+DATABASE, SCHEMA, TABLE, UPLOAD_TABLE = "BENCH", "MASTER", "CUSTOMERS", "CUSTOMERS_UPLOAD"
+TABLE_ROWS = 100_000
+UPLOAD_SIZES = [1_000, 100_000, 1_000_000]
+COUNTRIES = ["DE", "FR", "GB", "IN", "JP", "NL", "US"]
+
+TABLE_DDL = """
+    CREATE TABLE {fqn} (
+        ID INTEGER PRIMARY KEY,
+        NAME VARCHAR(100),
+        COUNTRY VARCHAR(2),
+        SIGNUP_DATE DATE,
+        BALANCE DECIMAL(12,2),
+        ACTIVE BOOLEAN
+    )
+"""
+
+
+def build_warehouse(rows=TABLE_ROWS):
+    warehouse = FakeWarehouse()
+    warehouse.create_database(DATABASE, [SCHEMA, "STAGING"])
+    warehouse.create_database("ARCHIVE", ["PUBLIC"])
+    for table in (TABLE, UPLOAD_TABLE):
+        warehouse.execute(TABLE_DDL.format(fqn=f"{DATABASE}.{SCHEMA}.{table}"))
+    warehouse.execute(f"""
+        INSERT INTO {DATABASE}.{SCHEMA}.{TABLE}
+        SELECT i, 'Customer ' || i, ['{"', '".join(COUNTRIES)}'][i % {len(COUNTRIES)} + 1],
+               DATE '2015-01-01' + (i % 3000)::INTEGER, (i % 100000) / 7, i % 3 <> 0
+        FROM range({rows}) r(i)
+    """)
+    return warehouse
+
+
+def upload_csv(rows, start):
+    ids = np.arange(start, start + rows)
+    df = pd.DataFrame({
+        "ID": ids,
+        "NAME": "Upload " + pd.Series(ids).astype(str),
+        "COUNTRY": np.array(COUNTRIES)[ids % len(COUNTRIES)],
+        "SIGNUP_DATE": (pd.Timestamp("2020-01-01") + pd.to_timedelta(ids % 1000, unit="D")).strftime("%Y-%m-%d"),
+        "BALANCE": (ids % 10000) / 4,
+        "ACTIVE": np.where(ids % 2 == 0, "true", "false"),
+    })
+    return io.BytesIO(df.to_csv(index=False).encode())
+
+
+class Recorder:
+    def __init__(self, warehouse, repeat):
+        self.warehouse = warehouse
+        self.repeat = repeat
+        self.results = {}
+
+    def measure(self, name, setup, action, repeat=None):
+        """Median time of ``action(setup())``; queries (including prefetches it starts) are counted on the last run."""
+        times = []
+        for _ in range(repeat or self.repeat):
+            state = setup()
+            if isinstance(state, AppTest):
+                settled(state)
+            self.warehouse.reset_counters()
+            started = time.perf_counter()
+            result = action(state)
+            times.append(time.perf_counter() - started)
+            if isinstance(state, AppTest):
+                settled(state)
+        extra = result if isinstance(result, dict) else {}
+        self.results[name] = {"queries": self.warehouse.query_count, "seconds": round(statistics.median(times), 4), **extra}
+        print(f"  {name:<24} {self.warehouse.query_count:>5} queries  {statistics.median(times):8.3f}s"
+              + "".join(f"  {k}={v:,}" for k, v in extra.items()))
+
+
+def new_app(select_table=False):
+    at = AppTest.from_file(os.path.join(REPO, "app.py"), default_timeout=120)
+    if select_table:
+        at.session_state["selected_db"] = DATABASE
+        at.session_state["selected_schema"] = SCHEMA
+        at.session_state["selected_table"] = TABLE
+    return at
+
+
+def ran(at):
+    at.run()
+    if at.exception:
+        raise RuntimeError(at.exception[0].value)
+    return at
+
+
+def settled(at):
+    """Wait for background prefetches and index builds so their queries are not counted against the next interaction."""
+    while get_catalog_index().building:
+        time.sleep(0.005)
+    if "page_cache" in at.session_state:
+        while at.session_state["page_cache"].pending:
+            time.sleep(0.005)
+    return at
+
+
+def button(at, label):
+    return next(b for b in at.button if b.label == label)
+
+
+def app_benchmarks(rec):
+    rec.measure("sidebar_cold", new_app, ran)
+    rec.measure("sidebar_warm", lambda: ran(new_app()), ran)
+
+    def expand_database(at):
+        button(at, f"🗂️ {DATABASE}").click()
+        at.run()
+
+    rec.measure("sidebar_expand_db", lambda: ran(new_app()), expand_database)
+    rec.measure("page_view_cold", lambda: new_app(select_table=True), ran)
+    rec.measure("page_view_warm", lambda: ran(new_app(select_table=True)), ran)
+
+    def next_page(at):
+        button(at, "➡️ Next").click()
+        at.run()
+
+    rec.measure("page_next", lambda: ran(new_app(select_table=True)), next_page)
+
+    def add_filter(at):
+        at.multiselect[0].select("COUNTRY").run()
+
+    rec.measure("filter_add_column", lambda: ran(new_app(select_table=True)), add_filter)
+
+    def pick_value(at):
+        at.selectbox(key="filter_COUNTRY").select("FR").run()
+
+    rec.measure(
+        "filter_pick_value",
+        lambda: new_app(select_table=True).run().multiselect[0].select("COUNTRY").run(),
+        pick_value,
+    )
+
+
+def save_benchmark(rec, session):
+    schema = load_table_schema(session, DATABASE, SCHEMA, TABLE)
+    columns = schema.column_names
+
+    def setup():
+        original = session.sql(f"SELECT * FROM {schema.fqn} ORDER BY ID LIMIT 50").to_pandas()
+        edited = original.copy()
+        edited["✅ Delete"] = False
+        original["✅ Delete"] = False
+        edited.loc[:39, "NAME"] = edited.loc[:39, "NAME"] + " (edited)"
+        edited.loc[45:, "✅ Delete"] = True
+        new_rows = pd.DataFrame({"ID": range(10_000_000, 10_000_010), "NAME": "New", "COUNTRY": "US"})
+        edited = pd.concat([edited, new_rows], ignore_index=True)
+        return build_change_set(original, edited, columns, schema.primary_key, delete_column="✅ Delete")
+
+    def save(change_set):
+        summary = apply_change_set(session, change_set, schema)
+        session.sql(f"DELETE FROM {schema.fqn} WHERE ID >= 10000000").collect()
+        return {"rows": summary.inserted + summary.updated + summary.deleted}
+
+    rec.measure("save_change_set", setup, save)
+
+
+def upload_benchmarks(rec, session, sizes):
+    schema = load_table_schema(session, DATABASE, SCHEMA, UPLOAD_TABLE)
+    for rows in sizes:
+        def setup(rows=rows):
+            session.sql(f"DELETE FROM {schema.fqn}").collect()
+            return upload_csv(rows, start=0)
+
+        def upload(file):
+            result, progress = ingest_chunks(session, read_csv_chunks(file), schema)
+            if result.rows_loaded != progress.rows_read:
+                raise RuntimeError(f"{progress.rows_rejected} rows rejected: {progress.errors[:3]}")
+            return {"rows_per_second": int(progress.rows_read / progress.elapsed)}
+
+        rec.measure(f"upload_{rows}", setup, upload, repeat=1 if rows >= 1_000_000 else None)
+
+
+def compare(results, baseline, timings, tolerance, slack):
+    """Regressions against the query-count ``baseline`` and, when given, the local ``timings``."""
+    failures = []
+    for name, current in results.items():
+        previous = baseline.get(name)
+        if previous is not None and current["queries"] > previous["queries"]:
+            failures.append(f"{name}: {current['queries']} queries, baseline {previous['queries']}")
+        recorded = (timings or {}).get(name)
+        if recorded is None:
+            continue
+        limit = recorded * (1 + tolerance) + slack
+        if current["seconds"] > limit:
+            failures.append(f"{name}: {current['seconds']:.3f}s, local baseline {recorded:.3f}s (limit {limit:.3f}s)")
+    return failures
+
+
+def _read_json(path):
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def _write_json(path, data):
+    with open(path, "w") as f:
+        json.dump(data, f, indent=2, sort_keys=True)
+        f.write("\n")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--sizes", type=int, nargs="*", default=UPLOAD_SIZES, help="upload sizes in rows")
+    parser.add_argument("--repeat", type=int, default=5, help="runs per interaction (median is reported)")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed relative slowdown")
+    parser.add_argument("--slack", type=float, default=0.15, help="allowed absolute slowdown in seconds")
+    parser.add_argument("--baseline", default=BASELINE, help="committed query counts")
+    parser.add_argument("--timings", default=LOCAL_TIMINGS, help="timings recorded on this machine")
+    parser.add_argument("--update-baseline", action="store_true")
+    args = parser.parse_args(argv)
+    # AppTest runs the script outside a server; its context warnings are noise here.
+    logging.disable(logging.WARNING)
+
+    print(f"Building fake warehouse ({TABLE_ROWS:,} rows)…")
+    warehouse = build_warehouse()
+    rec = Recorder(warehouse, args.repeat)
+    with patched_session_pool(warehouse):
+        print("App interactions:")
+        app_benchmarks(rec)
+    session = warehouse.session()
+    print("Save and upload:")
+    save_benchmark(rec, session)
+    upload_benchmarks(rec, session, args.sizes)
+
+    if args.update_baseline:
+        # Only what does not depend on the machine is committed
+        _write_json(args.baseline, {
+            name: {key: value for key, value in result.items() if key in ("queries", "rows")}
+            for name, result in rec.results.items()
+        })
+        _write_json(args.timings, {name: result["seconds"] for name, result in rec.results.items()})
+        print(f"Baseline written to {args.baseline}, this machine's timings to {args.timings}")
+        return 0
+
+    baseline = _read_json(args.baseline)
+    if baseline is None:
+        print("No baseline yet; run with --update-baseline to record one.")
+        return 0
+    timings = _read_json(args.timings)
+    if timings is None:
+        print("Comparing query counts only; run with --update-baseline to also check timings on this machine.")
+    failures = compare(rec.results, baseline, timings, args.tolerance, args.slack)
+    for failure in failures:
+        print(f"REGRESSION {failure}")
+    print("OK" if not failures else f"{len(failures)} regression(s)")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
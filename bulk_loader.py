@@ -0,0 +1,94 @@
+import time
+from dataclasses import dataclass
+
+from sql_builder import ident, qualified
+from staging import affected_rows, append_staged, drop_staged, temp_table_name
+
+
+@dataclass
+class LoadResult:
+    rows_loaded: int
+    rows_updated: int
+    elapsed: float
+
+    @property
+    def rows_per_second(self):
+        return self.rows_loaded / self.elapsed if self.elapsed else 0.0
+
+
+class StagedLoad:
+    """A load into one target table that is staged piece by piece and published at once.
+
+    Every ``append`` writes a frame into the same temporary table
+    (``write_pandas``); ``commit`` then copies the whole stage into the
+    target with a single ``INSERT ... SELECT``, or a ``MERGE`` on
+    ``merge_keys``, inside one transaction. Either every staged row lands or
+    none does.
+    """
+
+    def __init__(self, session, database_name, schema_name, table_name, columns, merge_keys=None):
+        self.session = session
+        self.database_name = database_name
+        self.schema_name = schema_name
+        self.target = qualified(database_name, schema_name, table_name)
+        self.columns = list(columns)
+        self.merge_keys = list(merge_keys or [])
+        self.staged_name = temp_table_name("PRISM_LOAD")
+        self.staged_table = qualified(database_name, schema_name, self.staged_name)
+        self.rows_staged = 0
+        self.started = time.perf_counter()
+
+    def append(self, df):
+        if df.empty:
+            return
+        # Values are staged as text and cast by Snowflake on insert, exactly
+        # like the quoted literals of the row-by-row path.
+        staged = df.reindex(columns=self.columns).astype("string")
+        append_staged(self.session, staged, self.database_name, self.schema_name, self.staged_name)
+        self.rows_staged += len(staged)
+
+    def _load_query(self):
+        col_list = ", ".join(ident(col) for col in self.columns)
+        if not self.merge_keys:
+            return f"INSERT INTO {self.target} ({col_list}) SELECT {col_list} FROM {self.staged_table}"
+        on_clause = " AND ".join(f"t.{ident(key)} = s.{ident(key)}" for key in self.merge_keys)
+        set_clause = ", ".join(f"{ident(col)} = s.{ident(col)}" for col in self.columns if col not in self.merge_keys)
+        matched = f"WHEN MATCHED THEN UPDATE SET {set_clause}" if set_clause else ""
+        return f"""
+            MERGE INTO {self.target} t
+            USING {self.staged_table} s
+              ON {on_clause}
+            {matched}
+            WHEN NOT MATCHED THEN INSERT ({col_list}) VALUES ({", ".join(f"s.{ident(col)}" for col in self.columns)})
+        """
+
+    def commit(self):
+        if not self.rows_staged:
+            return LoadResult(0, 0, time.perf_counter() - self.started)
+        try:
+            self.session.sql("BEGIN").collect()
+            try:
+                result = self.session.sql(self._load_query()).collect()
+                self.session.sql("COMMIT").collect()
+            except Exception:
+                self.session.sql("ROLLBACK").collect()
+                raise
+        finally:
+            self.discard()
+
+        return LoadResult(
+            rows_loaded=affected_rows(result, "number of rows inserted"),
+            rows_updated=affected_rows(result, "number of rows updated") if self.merge_keys else 0,
+            elapsed=time.perf_counter() - self.started,
+        )
+
+    def discard(self):
+        if self.rows_staged:
+            drop_staged(self.session, self.staged_table)
+
+
+def bulk_load(session, df, database_name, schema_name, table_name, merge_keys=None):
+    """Load ``df`` into the target table in one transaction (see ``StagedLoad``)."""
+    load = StagedLoad(session, database_name, schema_name, table_name, df.columns, merge_keys)
+    load.append(df)
+    return load.commit()
@@ -0,0 +1,74 @@
+import time
+
+import streamlit as st
+
+from fetch import fetch_column
+from sql_builder import ident, qualified
+
+# Seconds each level of the catalog tree is trusted before it is re-read.
+DEFAULT_TTLS = {
+    "databases": 600,
+    "schemas": 300,
+    "tables": 120,
+}
+
+
+class CatalogCache:
+    """Per-user cache of the database -> schema -> table tree shown in the sidebar.
+
+    Every level is loaded lazily, only for the node being expanded, and kept for
+    its own TTL so that a repeat render of the sidebar issues no queries.
+    """
+
+    def __init__(self, ttls=None):
+        self.ttls = {**DEFAULT_TTLS, **(ttls or {})}
+        self._entries = {}
+
+    def _get(self, level, key, loader):
+        entry = self._entries.get((level, key))
+        now = time.monotonic()
+        if entry is not None and now - entry[0] < self.ttls[level]:
+            return entry[1]
+        value = loader()
+        self._entries[(level, key)] = (now, value)
+        return value
+
+    def databases(self, session):
+        return self._get(
+            "databases",
+            (),
+            lambda: [db["name"] for db in session.sql("SHOW DATABASES").collect()],
+        )
+
+    def schemas(self, session, db_name):
+        return self._get(
+            "schemas",
+            (db_name,),
+            lambda: fetch_column(
+                session,
+                f"SELECT schema_name FROM {ident(db_name)}.information_schema.schemata WHERE schema_name <> 'INFORMATION_SCHEMA'",
+            ),
+        )
+
+    def tables(self, session, db_name, schema_name):
+        return self._get(
+            "tables",
+            (db_name, schema_name),
+            lambda: [t["name"] for t in session.sql(f"SHOW TABLES IN {qualified(db_name, schema_name)}").collect()],
+        )
+
+    def refresh(self, db_name=None, schema_name=None):
+        """Drop cached entries for a node and everything below it (the whole tree by default)."""
+        if db_name is None:
+            self._entries.clear()
+            return
+        prefix = (db_name,) if schema_name is None else (db_name, schema_name)
+        for level, key in list(self._entries):
+            if key[: len(prefix)] == prefix:
+                del self._entries[(level, key)]
+
+
+def get_catalog_cache():
+    if "catalog_cache" not in st.session_state:
+        st.session_state["catalog_cache"] = CatalogCache()
+    return st.session_state["catalog_cache"]
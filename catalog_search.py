@@ -0,0 +1,178 @@
+import bisect
+import difflib
+import threading
+import time
+from dataclasses import dataclass
+
+import streamlit as st
+
+from fetch import fetch_frame
+from sql_builder import Sql, ident, join
+
+# Seconds an index is used before a rebuild is started in the background.
+CATALOG_INDEX_REFRESH = 15 * 60
+# Databases whose INFORMATION_SCHEMA.COLUMNS are read in one UNION ALL query.
+DATABASES_PER_QUERY = 25
+# Results shown for a search.
+SEARCH_LIMIT = 10
+# difflib similarity a table name needs to count as a fuzzy match.
+FUZZY_CUTOFF = 0.6
+
+
+@dataclass(frozen=True)
+class SearchHit:
+    database: str
+    schema: str
+    table: str
+    match: str  # the table or column name that matched
+    kind: str  # "table" or "column"
+
+    @property
+    def fqn(self):
+        return f"{self.database}.{self.schema}.{self.table}"
+
+
+class CatalogIndex:
+    """Searchable list of every table and column the app's role can see, views excluded.
+
+    Built on a background thread from ``SHOW DATABASES`` plus one
+    ``INFORMATION_SCHEMA.COLUMNS`` query per ``DATABASES_PER_QUERY``
+    databases, and rebuilt the same way once it is older than
+    ``CATALOG_INDEX_REFRESH``; searches keep using the previous index
+    meanwhile. Names are kept in one sorted list, so a prefix search is a
+    bisection; when that finds too little, substring and ``difflib`` matches
+    on table names fill up the results.
+    """
+
+    def __init__(self):
+        self._names = []  # sorted (lowercase name, kind, (db, schema, table), name)
+        self._table_names = {}  # lowercase table name -> [(db, schema, table)]
+        self.table_count = 0
+        self.column_count = 0
+        self.built_at = None
+        self.error = None
+        self._building = False
+        self._lock = threading.Lock()
+
+    @property
+    def building(self):
+        return self._building
+
+    def ensure_fresh(self, session_pool):
+        """Start a background (re)build on a ``session_pool`` session when there is no index yet or it has gone stale."""
+        with self._lock:
+            stale = self.built_at is None or time.monotonic() - self.built_at > CATALOG_INDEX_REFRESH
+            if self._building or not stale:
+                return
+            self._building = True
+        threading.Thread(target=self._build, args=(session_pool,), name="catalog-index", daemon=True).start()
+
+    def refresh(self, session_pool):
+        """Rebuild now instead of waiting for ``CATALOG_INDEX_REFRESH``."""
+        with self._lock:
+            if not self._building:
+                self.built_at = None
+        self.ensure_fresh(session_pool)
+
+    def _build(self, session_pool):
+        try:
+            with session_pool.lease("catalog-index", timeout=None) as session:
+                columns = self._load_columns(session)
+            self._install(columns)
+            self.error = None
+        except Exception as e:
+            self.error = str(e)
+        finally:
+            self.built_at = time.monotonic()
+            self._building = False
+
+    @staticmethod
+    def _load_columns(session):
+        databases = [row["name"] for row in session.sql("SHOW DATABASES").collect()]
+        frames = []
+        for start in range(0, len(databases), DATABASES_PER_QUERY):
+            batch = databases[start:start + DATABASES_PER_QUERY]
+            try:
+                frames.append(fetch_frame(session, _columns_query(batch)))
+            except Exception:
+                # One database we may not read should not hide all the others.
+                for db_name in batch:
+                    try:
+                        frames.append(fetch_frame(session, _columns_query([db_name])))
+                    except Exception:
+                        pass
+        return [row for frame in frames for row in frame.itertuples(index=False, name=None)]
+
+    def _install(self, columns):
+        names, table_names, tables = [], {}, set()
+        for db_name, schema_name, table_name, column_name in columns:
+            table = (db_name, schema_name, table_name)
+            if table not in tables:
+                tables.add(table)
+                table_names.setdefault(table_name.lower(), []).append(table)
+                names.append((table_name.lower(), "table", table, table_name))
+                names.append((f"{schema_name}.{table_name}".lower(), "table", table, table_name))
+            names.append((column_name.lower(), "column", table, column_name))
+        names.sort()
+        with self._lock:
+            self._names, self._table_names = names, table_names
+            self.table_count, self.column_count = len(tables), len(columns)
+
+    def search(self, text, limit=SEARCH_LIMIT):
+        query = text.strip().lower()
+        if not query:
+            return []
+        with self._lock:
+            names, table_names = self._names, self._table_names
+
+        hits, seen = [], set()
+
+        def add(table, match, kind):
+            if table not in seen and len(hits) < limit:
+                seen.add(table)
+                hits.append(SearchHit(*table, match=match, kind=kind))
+
+        # Prefix matches, tables before columns
+        start = bisect.bisect_left(names, (query,))
+        prefixed = []
+        for entry in names[start:]:
+            if not entry[0].startswith(query):
+                break
+            prefixed.append(entry)
+        for _, kind, table, name in sorted(prefixed, key=lambda entry: entry[1] != "table"):
+            add(table, name, kind)
+
+        if len(hits) < limit:
+            for name in table_names:
+                if query in name:
+                    for table in table_names[name]:
+                        add(table, table[2], "table")
+        if len(hits) < limit:
+            for name in difflib.get_close_matches(query, list(table_names), n=limit, cutoff=FUZZY_CUTOFF):
+                for table in table_names[name]:
+                    add(table, table[2], "table")
+        return hits
+
+
+def _columns_query(databases):
+    return join(
+        [
+            Sql(
+                f"""
+                SELECT ? AS DATABASE_NAME, c.TABLE_SCHEMA, c.TABLE_NAME, c.COLUMN_NAME
+                FROM {ident(db_name)}.INFORMATION_SCHEMA.COLUMNS c
+                JOIN {ident(db_name)}.INFORMATION_SCHEMA.TABLES t
+                  ON t.TABLE_SCHEMA = c.TABLE_SCHEMA AND t.TABLE_NAME = c.TABLE_NAME
+                WHERE c.TABLE_SCHEMA <> 'INFORMATION_SCHEMA' AND t.TABLE_TYPE = 'BASE TABLE'
+                """,
+                (db_name,),
+            )
+            for db_name in databases
+        ],
+        " UNION ALL ",
+    )
+
+
+@st.cache_resource
+def get_catalog_index():
+    return CatalogIndex()
@@ -0,0 +1,154 @@
+from dataclasses import dataclass
+
+import pandas as pd
+
+from sql_builder import ident, in_rows, join, run
+from staging import affected_rows, drop_staged, stage_dataframe
+
+KEY_PREFIX = "__KEY_"
+CHANGED_PREFIX = "__CHG_"
+# Staged flag telling edited rows (matched on their original key) from new rows.
+UPDATE_FLAG = "__IS_UPDATE"
+
+
+class NullKeyError(ValueError):
+    pass
+
+
+@dataclass
+class ChangeSet:
+    """Everything edited in the grid for one page, gathered for a single write."""
+
+    key_columns: list
+    inserts: pd.DataFrame  # new rows, table columns only
+    updates: pd.DataFrame  # edited rows with their new values
+    update_keys: pd.DataFrame  # original key values of ``updates``, same index
+    changed: pd.DataFrame  # boolean mask of edited cells in ``updates``
+    deletes: pd.DataFrame  # original key values of rows ticked for deletion
+
+    def is_empty(self):
+        return self.inserts.empty and self.updates.empty and self.deletes.empty
+
+
+@dataclass
+class ChangeSummary:
+    inserted: int
+    updated: int
+    deleted: int
+
+    def __str__(self):
+        return f"{self.inserted} inserted, {self.updated} updated, {self.deleted} deleted"
+
+
+def build_change_set(original_df, edited_df, column_names, key_columns, delete_column=None, include_edits=True):
+    """Compare the page as fetched with the edited grid.
+
+    ``original_df`` holds the fetched rows; rows of ``edited_df`` past its
+    length are new rows, rows where ``delete_column`` is ticked are deletes.
+    """
+    existing = len(original_df)
+    before = original_df[column_names].reset_index(drop=True)
+    after = edited_df.iloc[:existing][column_names].reset_index(drop=True)
+
+    ticked = pd.Series(False, index=after.index)
+    if delete_column is not None:
+        ticked = edited_df.iloc[:existing][delete_column].eq(True).reset_index(drop=True)
+    deletes = before.loc[ticked, key_columns]
+
+    if not include_edits:
+        empty = before.iloc[0:0]
+        return ChangeSet(key_columns, empty, empty, empty[key_columns], empty.astype(bool), deletes)
+
+    # Compare on the grid's dtypes (integer columns come back as nullable Int64) and count
+    # a value against a missing one as a change, e.g. a cleared integer cell.
+    compared = before.astype(after.dtypes.to_dict(), errors="ignore")
+    changed = compared.ne(after).fillna(True) & ~(compared.isna() & after.isna())
+    changed = changed.astype(bool)
+    changed.loc[ticked] = False  # rows being deleted are not updated
+    edited_rows = changed.any(axis=1)
+
+    new_rows = edited_df.iloc[existing:][column_names]
+    inserts = new_rows[new_rows.notna().any(axis=1)]
+
+    return ChangeSet(
+        key_columns=key_columns,
+        inserts=inserts,
+        updates=after[edited_rows],
+        update_keys=before.loc[edited_rows, key_columns],
+        changed=changed[edited_rows],
+        deletes=deletes,
+    )
+
+
+def apply_change_set(session, change_set, table_schema):
+    """Apply inserts, updates and deletes as one ``MERGE`` and one ``DELETE`` in a single transaction."""
+    columns = table_schema.column_names
+    keys = change_set.key_columns
+    target = table_schema.sql_name
+    statements = []
+
+    # A NULL key matches no table row, so such an edit or delete could never be applied.
+    for rows, action in ((change_set.update_keys, "edited"), (change_set.deletes, "ticked for deletion")):
+        missing = int(rows[keys].isna().any(axis=1).sum())
+        if missing:
+            raise NullKeyError(
+                f"{missing} row(s) {action} have no value in {', '.join(keys)}, so they cannot be matched to a table row."
+            )
+
+    tmp_table = None
+    if not change_set.inserts.empty or not change_set.updates.empty:
+        staged = pd.concat(
+            [
+                change_set.updates.astype("string").reset_index(drop=True),
+                change_set.inserts.astype("string").reset_index(drop=True),
+            ],
+            ignore_index=True,
+        )
+        for key in keys:
+            original = change_set.update_keys[key].astype("string").reset_index(drop=True)
+            staged[f"{KEY_PREFIX}{key}"] = original.reindex(staged.index)
+        staged[UPDATE_FLAG] = staged.index < len(change_set.updates)
+        for col in columns:
+            flags = change_set.changed[col].reset_index(drop=True)
+            staged[f"{CHANGED_PREFIX}{col}"] = flags.reindex(staged.index, fill_value=False).astype(bool)
+        tmp_table = stage_dataframe(session, staged, table_schema.database, table_schema.schema, prefix="PRISM_CHG")
+
+        on_clause = f"s.{ident(UPDATE_FLAG)} AND " + " AND ".join(f"t.{ident(key)} = s.{ident(KEY_PREFIX + key)}" for key in keys)
+        # Staged values are text; cast each one to its column type explicitly.
+        values = {col.name: f"s.{ident(col.name)}::{col.sql_type}" for col in table_schema.columns}
+        set_clause = ", ".join(
+            f"{ident(col)} = IFF(s.{ident(CHANGED_PREFIX + col)}, {values[col]}, t.{ident(col)})" for col in columns
+        )
+        col_list = ", ".join(ident(col) for col in columns)
+        val_list = ", ".join(values[col] for col in columns)
+        statements.append(("merge", f"""
+            MERGE INTO {target} t
+            USING {tmp_table} s
+              ON {on_clause}
+            WHEN MATCHED THEN UPDATE SET {set_clause}
+            WHEN NOT MATCHED AND NOT s.{ident(UPDATE_FLAG)} THEN INSERT ({col_list}) VALUES ({val_list})
+        """))
+
+    if not change_set.deletes.empty:
+        key_rows = list(change_set.deletes[keys].itertuples(index=False, name=None))
+        statements.append(("delete", join([f"DELETE FROM {target} WHERE", in_rows(keys, key_rows)])))
+
+    summary = ChangeSummary(0, 0, 0)
+    try:
+        session.sql("BEGIN").collect()
+        try:
+            for kind, statement in statements:
+                result = run(session, statement).collect()
+                if kind == "merge":
+                    summary.inserted = affected_rows(result, "number of rows inserted")
+                    summary.updated = affected_rows(result, "number of rows updated")
+                else:
+                    summary.deleted = affected_rows(result, "number of rows deleted")
+            session.sql("COMMIT").collect()
+        except Exception:
+            session.sql("ROLLBACK").collect()
+            raise
+    finally:
+        if tmp_table is not None:
+            drop_staged(session, tmp_table)
+    return summary
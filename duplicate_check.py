@@ -0,0 +1,51 @@
+from fetch import fetch_column
+from sql_builder import ident, qualified
+from staging import drop_staged, stage_dataframe
+
+ROW_ID_COLUMN = "__ROW_IDX"
+
+
+def find_duplicate_rows(session, df, column_names, database_name, schema_name, table_name, also_in=None):
+    """Return the index labels of ``df`` rows that already exist in the target table.
+
+    All candidate rows are uploaded once to a temporary table and matched
+    against the target with a single NULL-safe join, instead of one
+    ``SELECT COUNT(*)`` per row. Rows repeated inside ``df`` itself are
+    reported too (every occurrence after the first), so a batch never
+    inserts the same full row twice.
+
+    ``also_in`` maps further qualified table names (e.g. the staging table of
+    a load in progress) to their columns; rows found there count as
+    duplicates as well.
+    """
+    if df.empty or not column_names:
+        return set()
+
+    candidates = df.reindex(columns=column_names).astype("string")
+    duplicates = set(candidates.index[candidates.duplicated(keep="first")])
+
+    existing = qualified(database_name, schema_name, table_name)
+    if also_in:
+        selects = ["SELECT " + ", ".join(ident(col) for col in column_names) + f" FROM {existing}"]
+        for other_table, other_columns in also_in.items():
+            projection = ", ".join(ident(col) if col in other_columns else f"NULL AS {ident(col)}" for col in column_names)
+            selects.append(f"SELECT {projection} FROM {other_table}")
+        existing = "(" + " UNION ALL ".join(selects) + ")"
+
+    staged = candidates.reset_index(drop=True)
+    staged[ROW_ID_COLUMN] = range(len(staged))
+    tmp_table = stage_dataframe(session, staged, database_name, schema_name, prefix="PRISM_DUP")
+    try:
+        on_clause = " AND ".join(f"EQUAL_NULL(t.{ident(col)}, c.{ident(col)})" for col in column_names)
+        dup_query = f"""
+            SELECT DISTINCT c.{ident(ROW_ID_COLUMN)} AS ROW_IDX
+            FROM {tmp_table} c
+            JOIN {existing} t
+              ON {on_clause}
+        """
+        positions = [int(position) for position in fetch_column(session, dup_query)]
+    finally:
+        drop_staged(session, tmp_table)
+
+    duplicates.update(candidates.index[positions])
+    return duplicates
@@ -0,0 +1,299 @@
+import os
+import shutil
+import tempfile
+import time
+import uuid
+import weakref
+from dataclasses import dataclass, field
+
+import openpyxl
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+from fetch import fetch_batches
+from sql_builder import Sql, ident, join, qualified, run, where
+from typed_csv import MAX_FLOAT_PRECISION, NAIVE_TIMESTAMP_TYPES, arrow_type
+from validation import FIXED_POINT_TYPES, TIME_TYPES, TIMESTAMP_TYPES
+
+# Export formats offered in the viewer: label -> format.
+EXPORT_FORMATS = {"CSV": "csv", "Excel (xlsx)": "xlsx", "Parquet": "parquet"}
+# CSV and Parquet exports estimated larger than this (bytes) are unloaded on the server with COPY INTO;
+# anything smaller passes through the app server's memory when downloaded.
+STAGE_EXPORT_THRESHOLD = 256 * 1024 ** 2
+# Data rows an Excel sheet can hold below its header row.
+XLSX_MAX_ROWS = 1_048_575
+# Named stage, in the exported table's schema, that large exports are unloaded to and served from.
+EXPORT_STAGE = "PRISM_EXPORTS"
+# Seconds a presigned download link stays valid; older unloads are removed from the stage.
+PRESIGNED_URL_EXPIRY = 60 * 60
+# Largest file a single-file COPY INTO may write (5 GB).
+MAX_UNLOAD_FILE_SIZE = 5 * 1024 ** 3
+
+_MIME_TYPES = {
+    "csv": "text/csv",
+    "csv.gz": "application/gzip",
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    "parquet": "application/vnd.apache.parquet",
+}
+_UNLOAD_FORMATS = {
+    "csv": "TYPE = CSV COMPRESSION = GZIP FIELD_OPTIONALLY_ENCLOSED_BY = '\"' NULL_IF = ('') EMPTY_FIELD_AS_NULL = FALSE",
+    "parquet": "TYPE = PARQUET",
+}
+
+
+class ExportTooLargeError(Exception):
+    pass
+
+
+@dataclass
+class ExportProgress:
+    total_rows: int
+    rows_written: int = 0
+    phase: str = "Starting…"
+    started: float = field(default_factory=time.perf_counter)
+
+    @property
+    def fraction(self):
+        return min(self.rows_written / self.total_rows, 1.0) if self.total_rows else 0.0
+
+    @property
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+
+@dataclass
+class ExportFile:
+    """A finished export: a local file in its own temporary folder, or a presigned ``url`` on a stage."""
+
+    path: str
+    file_name: str
+    mime: str
+    rows: int
+    elapsed: float
+    url: str = None
+
+    def __post_init__(self):
+        # Deletes the local file once nothing holds the export any more, e.g. its
+        # Streamlit session has ended, or at interpreter exit.
+        folder = os.path.dirname(self.path) if self.path else None
+        self._cleanup = weakref.finalize(self, shutil.rmtree, folder, ignore_errors=True) if folder else None
+
+    def read(self):
+        with open(self.path, "rb") as f:
+            return f.read()
+
+    def discard(self):
+        if self._cleanup is not None:
+            self._cleanup()
+
+
+def export_query(table_schema, where_clauses):
+    order_by = f"ORDER BY {', '.join(ident(key) for key in table_schema.primary_key)}" if table_schema.primary_key else ""
+    return join([f"SELECT * FROM {table_schema.sql_name}", where(where_clauses), order_by])
+
+
+def estimate_export_bytes(sample, total_rows):
+    """Approximate size of ``total_rows`` rows as CSV, scaled up from the CSV size of the ``sample`` rows."""
+    if sample is None or sample.empty or not total_rows:
+        return 0
+    sample_bytes = len(sample.to_csv(index=False, header=False).encode("utf-8"))
+    return int(sample_bytes / len(sample) * total_rows)
+
+
+def export_table(session, table_schema, where_clauses, fmt, total_rows, estimated_bytes, on_progress=None):
+    """Write the filtered rows of a table to a local temporary file and return it as an ``ExportFile``.
+
+    Exports up to ``STAGE_EXPORT_THRESHOLD`` ``estimated_bytes`` (see
+    ``estimate_export_bytes``) are fetched one Arrow batch at a time and
+    appended to the file, so memory holds a single batch until the download.
+    Larger CSV and Parquet exports run as one ``COPY INTO`` a stage and the
+    resulting file (CSV gzipped) is served from there by a presigned URL, so
+    it never passes through the app. Excel is limited to ``XLSX_MAX_ROWS``
+    and to the same size.
+    """
+    if fmt == "xlsx" and total_rows > XLSX_MAX_ROWS:
+        raise ExportTooLargeError(
+            f"{total_rows:,} rows do not fit in an Excel sheet ({XLSX_MAX_ROWS:,} max). Export as CSV or Parquet instead."
+        )
+    if fmt == "xlsx" and estimated_bytes > STAGE_EXPORT_THRESHOLD:
+        raise ExportTooLargeError(
+            f"About {estimated_bytes / 1024 ** 2:,.0f} MB is too large to build as an Excel file "
+            f"({STAGE_EXPORT_THRESHOLD / 1024 ** 2:,.0f} MB max). Export as CSV or Parquet instead."
+        )
+    progress = ExportProgress(total_rows)
+    query = export_query(table_schema, where_clauses)
+    if fmt != "xlsx" and estimated_bytes > STAGE_EXPORT_THRESHOLD:
+        return _unload_via_stage(session, query, table_schema, fmt, progress, on_progress)
+
+    writer = {"csv": _CsvWriter, "xlsx": _XlsxWriter, "parquet": _ParquetWriter}[fmt]
+    file_name = f"{table_schema.table}.{fmt}"
+    path = os.path.join(tempfile.mkdtemp(prefix="prism_export_"), file_name)
+    try:
+        with writer(path, table_schema) as out:
+            progress.phase = "Exporting"
+            for batch in fetch_batches(session, query):
+                out.write(batch)
+                progress.rows_written += len(batch)
+                if on_progress:
+                    on_progress(progress)
+    except BaseException:
+        shutil.rmtree(os.path.dirname(path), ignore_errors=True)
+        raise
+    return ExportFile(path, file_name, _MIME_TYPES[fmt], progress.rows_written, progress.elapsed)
+
+
+def _unload_via_stage(session, query, table_schema, fmt, progress, on_progress):
+    """``COPY INTO`` a named stage and return a presigned link to the file.
+
+    Unloads older than ``PRESIGNED_URL_EXPIRY`` are removed from the stage
+    first. Without the privilege to create the stage the export is refused
+    rather than pulled through the app server.
+    """
+    file_name = f"{table_schema.table}.csv.gz" if fmt == "csv" else f"{table_schema.table}.parquet"
+    mime = _MIME_TYPES["csv.gz" if fmt == "csv" else fmt]
+    # The folder name starts with its creation time, so stale unloads can be found without parsing LIST dates.
+    folder = f"{int(time.time())}_{uuid.uuid4().hex}"
+
+    def report(phase):
+        progress.phase = phase
+        if on_progress:
+            on_progress(progress)
+
+    report("Unloading on the server")
+    stage_name = qualified(table_schema.database, table_schema.schema, EXPORT_STAGE)
+    try:
+        # Presigned links only work on stages with server-side encryption
+        session.sql(f"CREATE STAGE IF NOT EXISTS {stage_name} ENCRYPTION = (TYPE = 'SNOWFLAKE_SSE')").collect()
+    except Exception as e:
+        raise ExportTooLargeError(
+            f"This export is too large to download through the app, and the stage {stage_name} it is served from "
+            f"could not be created ({e}). Ask an administrator for CREATE STAGE on {table_schema.database}.{table_schema.schema}, "
+            f"or narrow the filter."
+        ) from e
+
+    stage = f"@{stage_name}"
+    _remove_expired(session, stage)
+    _copy_into(session, f"{stage}/{folder}/{file_name}", query, fmt, progress)
+    rows = run(session, Sql(f"SELECT GET_PRESIGNED_URL({stage}, ?, ?) AS URL", (f"{folder}/{file_name}", PRESIGNED_URL_EXPIRY))).collect()
+    return ExportFile(None, file_name, mime, progress.rows_written, progress.elapsed, url=rows[0]["URL"])
+
+
+def _copy_into(session, target, query, fmt, progress):
+    result = run(session, join([
+        f"COPY INTO {target} FROM (",
+        query,
+        f""")
+        FILE_FORMAT = ({_UNLOAD_FORMATS[fmt]})
+        HEADER = TRUE
+        SINGLE = TRUE
+        MAX_FILE_SIZE = {MAX_UNLOAD_FILE_SIZE}
+        OVERWRITE = TRUE
+        """,
+    ])).collect()
+    progress.rows_written = int(result[0]["rows_unloaded"]) if result else 0
+
+
+def _remove_expired(session, stage):
+    """Remove earlier unloads whose links have expired; a failure here never stops an export."""
+    cutoff = time.time() - PRESIGNED_URL_EXPIRY
+    try:
+        names = [row["name"] for row in session.sql(f"LIST {stage}").collect()]
+        expired = set()
+        for name in names:
+            # LIST names look like "prism_exports/<created>_<uuid>/<file>"
+            parts = name.split("/")
+            created = parts[1].split("_", 1)[0] if len(parts) > 2 else ""
+            if created.isdigit() and int(created) < cutoff:
+                expired.add(parts[1])
+        for folder in expired:
+            session.sql(f"REMOVE {stage}/{folder}/").collect()
+    except Exception:
+        pass
+
+
+class _CsvWriter:
+    def __init__(self, path, table_schema):
+        self.file = open(path, "w", newline="", encoding="utf-8")
+        self.column_names = table_schema.column_names
+        self.header = True
+
+    def write(self, batch):
+        batch.reindex(columns=self.column_names).to_csv(self.file, header=self.header, index=False)
+        self.header = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        if self.header:
+            pd.DataFrame(columns=self.column_names).to_csv(self.file, index=False)
+        self.file.close()
+
+
+def _parquet_type(col):
+    """Arrow type ``col`` (a ``ColumnInfo``) is written as; text when nothing closer fits."""
+    data_type = str(col.data_type).upper()
+    if data_type in TIMESTAMP_TYPES - NAIVE_TIMESTAMP_TYPES:
+        return pa.timestamp("ns", tz="UTC")
+    if data_type in TIME_TYPES:
+        return pa.time64("us")
+    if data_type in FIXED_POINT_TYPES and col.scale and (col.precision or 38) > MAX_FLOAT_PRECISION:
+        return pa.decimal128(col.precision or 38, col.scale)
+    return arrow_type(col) or pa.string()
+
+
+def _to_arrow(series, target):
+    """``series`` as an Arrow array of ``target``, whatever pandas dtype this batch happened to get."""
+    try:
+        return pc.cast(pa.array(series, from_pandas=True), target)
+    except (pa.ArrowInvalid, pa.ArrowNotImplementedError, pa.ArrowTypeError):
+        if target != pa.string():
+            raise
+        # Values with no Arrow text cast, e.g. times or semi-structured data
+        return pa.array(series.astype(str).where(series.notna(), None), pa.string())
+
+
+class _ParquetWriter:
+    def __init__(self, path, table_schema):
+        # The schema comes from the table, not from the first batch, whose types
+        # depend on its values (an all-NULL column, a narrower integer).
+        self.schema = pa.schema([pa.field(col.name, _parquet_type(col)) for col in table_schema.columns])
+        self.writer = pq.ParquetWriter(path, self.schema)
+
+    def write(self, batch):
+        batch = batch.reindex(columns=self.schema.names)
+        arrays = [_to_arrow(batch[field.name], field.type) for field in self.schema]
+        self.writer.write_table(pa.Table.from_arrays(arrays, schema=self.schema))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.writer.close()
+
+
+class _XlsxWriter:
+    def __init__(self, path, table_schema):
+        self.path = path
+        self.column_names = table_schema.column_names
+        # Write-only mode streams rows to disk instead of building the sheet in memory
+        self.workbook = openpyxl.Workbook(write_only=True)
+        self.sheet = self.workbook.create_sheet()
+        self.sheet.append(self.column_names)
+
+    def write(self, batch):
+        batch = batch.reindex(columns=self.column_names)
+        for col in batch.columns:
+            # Excel cannot store time zones
+            if isinstance(batch[col].dtype, pd.DatetimeTZDtype):
+                batch[col] = batch[col].dt.tz_localize(None)
+        for row in batch.astype(object).where(batch.notna(), None).itertuples(index=False, name=None):
+            self.sheet.append(row)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.workbook.save(self.path)
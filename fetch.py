@@ -0,0 +1,22 @@
+from sql_builder import run
+
+
+def fetch_frame(session, query):
+    """Run ``query`` (text or ``sql_builder.Sql``) and return the result as a DataFrame with its native column dtypes.
+
+    Results are pulled as Arrow batches (``to_pandas``) instead of a list of
+    ``Row`` objects, so numbers, dates and timestamps stay typed columns and
+    no Python object is built per row.
+    """
+    return run(session, query).to_pandas()
+
+
+def fetch_column(session, query):
+    """First column of ``query``'s result as a list."""
+    df = fetch_frame(session, query)
+    return df.iloc[:, 0].tolist() if len(df.columns) else []
+
+
+def fetch_batches(session, query):
+    """Yield the result of ``query`` as a series of DataFrames, one Arrow batch at a time."""
+    yield from run(session, query).to_pandas_batches()
@@ -0,0 +1,99 @@
+import streamlit as st
+
+from fetch import fetch_column
+from sql_builder import Sql, between, equals, ident, join, run, where
+from validation import DATE_TYPES, FIXED_POINT_TYPES, FLOAT_TYPES, TIMESTAMP_TYPES
+
+# Columns with at most this many distinct values get a full, cached dropdown.
+LOW_CARDINALITY_LIMIT = 1000
+# High-cardinality columns are searched by prefix and show this many top matches.
+SEARCH_RESULT_LIMIT = 50
+LIKE_ESCAPE = "\\"
+
+
+def column_kind(column_info):
+    data_type = str(column_info.data_type).upper()
+    if data_type in FIXED_POINT_TYPES or data_type in FLOAT_TYPES:
+        return "numeric"
+    if data_type in DATE_TYPES or data_type in TIMESTAMP_TYPES:
+        return "date"
+    return "discrete"
+
+
+def filter_clauses(filter_values, table_schema, exclude=None):
+    """``Sql`` predicates for the active filters: ``"COL" = ?`` or, for range filters, a BETWEEN."""
+    kinds = {col.name: column_kind(col) for col in table_schema.columns}
+    clauses = []
+    for col, val in sorted(filter_values.items()):
+        if col == exclude:
+            continue
+        if isinstance(val, tuple):
+            low, high = val
+            target = f"{ident(col)}::DATE" if kinds.get(col) == "date" else ident(col)
+            clauses.append(between(target, low, high))
+        else:
+            clauses.append(equals(col, val))
+    return clauses
+
+
+class FilterValueService:
+    """Loads the choices offered by the viewer's filter widgets.
+
+    ``APPROX_COUNT_DISTINCT`` decides per column whether a full distinct list
+    is cheap enough; otherwise values are looked up by prefix on the server.
+    Numeric and date columns get their min/max for a range filter instead.
+    Every result is cached per table, column and the other active filters.
+    """
+
+    def __init__(self, session, table_schema):
+        self.session = session
+        self.table_schema = table_schema
+        self._cache = st.session_state.setdefault("filter_value_cache", {})
+
+    def _cached(self, key, loader):
+        key = (self.table_schema.fqn,) + key
+        if key not in self._cache:
+            self._cache[key] = loader()
+        return self._cache[key]
+
+    def cardinality(self, column):
+        def load():
+            query = f"SELECT APPROX_COUNT_DISTINCT({ident(column)}) AS N FROM {self.table_schema.sql_name}"
+            return int(self.session.sql(query).collect()[0]["N"])
+
+        return self._cached(("cardinality", column), load)
+
+    def distinct_values(self, column, other_clauses):
+        def load():
+            query = join([
+                f"SELECT DISTINCT {ident(column)} FROM {self.table_schema.sql_name}",
+                where(other_clauses + [Sql(f"{ident(column)} IS NOT NULL")]),
+                f"ORDER BY 1 LIMIT {LOW_CARDINALITY_LIMIT}",
+            ])
+            return fetch_column(self.session, query)
+
+        return self._cached(("distinct", column, tuple(other_clauses)), load)
+
+    def search(self, column, prefix, other_clauses):
+        def load():
+            pattern = "".join(LIKE_ESCAPE + ch if ch in "%_" + LIKE_ESCAPE else ch for ch in prefix) + "%"
+            match = Sql(f"{ident(column)}::VARCHAR ILIKE ? ESCAPE ?", (pattern, LIKE_ESCAPE))
+            query = join([
+                f"SELECT {ident(column)} AS VALUE, COUNT(*) AS N FROM {self.table_schema.sql_name}",
+                where(other_clauses + [match]),
+                f"GROUP BY 1 ORDER BY N DESC, 1 LIMIT {SEARCH_RESULT_LIMIT}",
+            ])
+            return fetch_column(self.session, query)
+
+        return self._cached(("search", column, prefix, tuple(other_clauses)), load)
+
+    def value_range(self, column, other_clauses):
+        def load():
+            query = join([
+                f"SELECT MIN({ident(column)}) AS LO, MAX({ident(column)}) AS HI FROM {self.table_schema.sql_name}",
+                where(other_clauses),
+            ])
+            row = run(self.session, query).collect()[0]
+            return row["LO"], row["HI"]
+
+        return self._cached(("range", column, tuple(other_clauses)), load)
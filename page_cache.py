@@ -0,0 +1,99 @@
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import streamlit as st
+
+# Memory the cached pages of one browser session may use before the least recently used are dropped.
+MAX_CACHE_BYTES = 64 * 1024 * 1024
+# Pages fetched in the background at once across all users of this app server.
+PREFETCH_WORKERS = 4
+
+_prefetch_executor = ThreadPoolExecutor(max_workers=PREFETCH_WORKERS, thread_name_prefix="page-prefetch")
+
+
+class PageCache:
+    """LRU cache of fetched pages, bounded by their in-memory size.
+
+    Keys start with the table's fully qualified name, followed by the filter
+    clauses, sort keys, page size and page number, so a write to one table
+    only drops that table's pages. Pages can be filled from prefetch threads;
+    a fetch that started before an ``invalidate`` of its table is discarded
+    instead of stored.
+    """
+
+    def __init__(self, max_bytes=MAX_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self._pages = OrderedDict()  # key -> (DataFrame, bytes)
+        self._bytes = 0
+        self._generations = {}  # table_fqn -> write counter
+        self._pending = set()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._pages.get(key)
+            if entry is None:
+                return None
+            self._pages.move_to_end(key)
+            return entry[0].copy()
+
+    def generation(self, table_fqn):
+        with self._lock:
+            return self._generations.get(table_fqn, 0)
+
+    def put(self, key, df, generation=None):
+        size = int(df.memory_usage(deep=True).sum())
+        with self._lock:
+            if generation is not None and generation != self._generations.get(key[0], 0):
+                return
+            if size > self.max_bytes:
+                return
+            if key in self._pages:
+                self._bytes -= self._pages.pop(key)[1]
+            self._pages[key] = (df.copy(), size)
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                self._bytes -= self._pages.popitem(last=False)[1][1]
+
+    def invalidate(self, table_fqn):
+        with self._lock:
+            self._generations[table_fqn] = self._generations.get(table_fqn, 0) + 1
+            for key in [key for key in self._pages if key[0] == table_fqn]:
+                self._bytes -= self._pages.pop(key)[1]
+
+    def prefetch(self, key, fetch):
+        """Run ``fetch()`` on a background thread and cache its result under ``key``, unless already cached or pending."""
+        with self._lock:
+            if key in self._pages or key in self._pending:
+                return
+            self._pending.add(key)
+            generation = self._generations.get(key[0], 0)
+
+        def run():
+            try:
+                self.put(key, fetch(), generation)
+            except Exception:
+                # A failed prefetch just means the page is fetched when it is shown.
+                pass
+            finally:
+                with self._lock:
+                    self._pending.discard(key)
+
+        _prefetch_executor.submit(run)
+
+    @property
+    def pending(self):
+        """Number of prefetches queued or running."""
+        return len(self._pending)
+
+    @property
+    def size_bytes(self):
+        return self._bytes
+
+    def __len__(self):
+        return len(self._pages)
+
+
+def get_page_cache():
+    return st.session_state.setdefault("page_cache", PageCache())
@@ -0,0 +1,126 @@
+import pandas as pd
+import streamlit as st
+
+from fetch import fetch_frame
+from query_log import InstrumentedSession, feature
+from sql_builder import ident, join, run, seek_predicate, where
+
+PAGE_SIZES = [25, 50, 100, 250, 500]
+# Seconds a prefetch waits for a pooled session before giving up; the page is then fetched when shown.
+PREFETCH_LEASE_TIMEOUT = 2
+
+
+def cached_row_count(session, table_schema, where_clauses):
+    """``COUNT(*)`` for a table and filter set (``Sql`` predicates), remembered for the rest of the session."""
+    counts = st.session_state.setdefault("row_counts", {})
+    key = (table_schema.fqn, tuple(where_clauses))
+    if key not in counts:
+        query = join([f"SELECT COUNT(*) AS N FROM {table_schema.sql_name}", where(where_clauses)])
+        counts[key] = int(run(session, query).collect()[0]["N"])
+    return counts[key]
+
+
+class KeysetPager:
+    """Pages through a table in a stable order.
+
+    With a primary key each page is fetched by seeking past the last key of
+    the previous page (``WHERE key > last ORDER BY key LIMIT n``), so deep
+    pages cost the same as the first one. The last key of every visited page
+    is kept as an anchor for the next one; jumping ahead locates the missing
+    anchor with one key-only query. Tables without a primary key fall back to
+    ``LIMIT/OFFSET`` ordered by every column.
+
+    With a ``PageCache`` pages are served from memory when possible, and
+    ``prefetch`` loads the pages either side of the current one in the
+    background so Prev/Next render without a query. Prefetches run on a
+    session leased from ``session_pool``, never on the user's own one, which
+    may be handed back, evicted or inside a transaction by then.
+    """
+
+    def __init__(self, session, table_schema, where_clauses, page_size, cache=None, session_pool=None):
+        self.session = session
+        self.session_pool = session_pool
+        self.table_fqn = table_schema.fqn
+        self.sql_name = table_schema.sql_name
+        self.column_names = table_schema.column_names
+        self.where_clauses = list(where_clauses)
+        self.keyset = bool(table_schema.primary_key)
+        self.sort_keys = list(table_schema.primary_key or self.column_names)
+        self.page_size = page_size
+        self.cache = cache
+        anchors = st.session_state.setdefault("page_anchors", {})
+        state_key = (self.table_fqn, tuple(self.where_clauses), tuple(self.sort_keys), page_size)
+        self._anchors = anchors.setdefault(state_key, {0: None})
+
+    @property
+    def order_by(self):
+        return ", ".join(ident(key) for key in self.sort_keys)
+
+    def _seek_clauses(self, anchor):
+        return self.where_clauses + ([seek_predicate(self.sort_keys, anchor)] if anchor is not None else [])
+
+    def _anchor_for(self, page, session):
+        if page in self._anchors:
+            return self._anchors[page]
+        known = max(p for p in self._anchors if p < page)
+        skip = (page - known) * self.page_size - 1
+        query = join([
+            f"SELECT {self.order_by} FROM {self.sql_name}",
+            where(self._seek_clauses(self._anchors[known])),
+            f"ORDER BY {self.order_by} LIMIT 1 OFFSET {skip}",
+        ])
+        rows = run(session, query).collect()
+        if not rows:
+            return None
+        self._anchors[page] = tuple(rows[0][key] for key in self.sort_keys)
+        return self._anchors[page]
+
+    def _cache_key(self, page):
+        return (self.table_fqn, tuple(self.where_clauses), tuple(self.sort_keys), self.page_size, page)
+
+    def fetch(self, page):
+        if self.cache is None:
+            return self._fetch(page)
+        key = self._cache_key(page)
+        cached = self.cache.get(key)
+        if cached is not None:
+            return cached
+        generation = self.cache.generation(self.table_fqn)
+        df = self._fetch(page)
+        self.cache.put(key, df, generation)
+        return df
+
+    def prefetch(self, page, page_count):
+        """Start loading the previous and next page into the cache."""
+        if self.cache is None or self.session_pool is None:
+            return
+        for neighbour in (page + 1, page - 1):
+            if 0 <= neighbour < page_count:
+                self.cache.prefetch(self._cache_key(neighbour), lambda n=neighbour: self._prefetched(n))
+
+    def _prefetched(self, page):
+        with feature("prefetch"), self.session_pool.lease(f"prefetch:{self.table_fqn}", PREFETCH_LEASE_TIMEOUT) as leased:
+            session = self.session.on(leased) if isinstance(self.session, InstrumentedSession) else leased
+            return self._fetch(page, session)
+
+    def _fetch(self, page, session=None):
+        session = self.session if session is None else session
+        if self.keyset:
+            anchor = self._anchor_for(page, session)
+            if anchor is None and page > 0:
+                return pd.DataFrame(columns=self.column_names)
+            query = join([
+                f"SELECT * FROM {self.sql_name}",
+                where(self._seek_clauses(anchor)),
+                f"ORDER BY {self.order_by} LIMIT {self.page_size}",
+            ])
+        else:
+            query = join([
+                f"SELECT * FROM {self.sql_name}",
+                where(self.where_clauses),
+                f"ORDER BY {self.order_by} LIMIT {self.page_size} OFFSET {page * self.page_size}",
+            ])
+        df = fetch_frame(session, query).reindex(columns=self.column_names)
+        if self.keyset and len(df) == self.page_size:
+            self._anchors[page + 1] = tuple(df[key].iloc[-1] for key in self.sort_keys)
+        return df
@@ -0,0 +1,197 @@
+import json
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import asdict, dataclass
+
+import pandas as pd
+import streamlit as st
+
+# Queries kept per browser session; the oldest are dropped first.
+MAX_RECORDS = 5000
+# Rows shown in the "slowest queries" table of the debug panel.
+SLOWEST_SHOWN = 10
+
+_feature = ContextVar("query_feature", default="other")
+
+
+@contextmanager
+def feature(name):
+    """Attribute every query issued inside the block (or decorated function) to ``name``."""
+    token = _feature.set(name)
+    try:
+        yield
+    finally:
+        _feature.reset(token)
+
+
+@dataclass
+class QueryRecord:
+    rerun: int
+    feature: str
+    sql: str
+    started_at: float
+    elapsed_ms: float
+    rows: int = None
+    query_id: str = None
+    error: str = None
+
+
+class QueryLog:
+    def __init__(self, max_records=MAX_RECORDS):
+        self.records = deque(maxlen=max_records)
+        self.rerun = 0
+
+    def start_rerun(self):
+        self.rerun += 1
+
+    def add(self, record):
+        self.records.append(record)
+
+    def to_frame(self, rerun=None):
+        records = [r for r in list(self.records) if rerun is None or r.rerun == rerun]
+        return pd.DataFrame([asdict(r) for r in records], columns=list(QueryRecord.__dataclass_fields__))
+
+    def to_json(self):
+        return json.dumps([asdict(r) for r in list(self.records)], default=str, indent=1)
+
+    def to_csv(self):
+        return self.to_frame().to_csv(index=False)
+
+
+def get_query_log():
+    return st.session_state.setdefault("query_log", QueryLog())
+
+
+def _query_id(history):
+    queries = getattr(history, "queries", None) if history is not None else None
+    return queries[-1].query_id if queries else None
+
+
+class InstrumentedDataFrame:
+    """Wraps a Snowpark DataFrame so that running it is timed and logged."""
+
+    def __init__(self, df, session, query):
+        self._df = df
+        self._session = session
+        self._query = query
+
+    def __getattr__(self, name):
+        return getattr(self._df, name)
+
+    def collect(self, *args, **kwargs):
+        return self._session._run(self._query, lambda: self._df.collect(*args, **kwargs), len)
+
+    def to_pandas(self, *args, **kwargs):
+        return self._session._run(self._query, lambda: self._df.to_pandas(*args, **kwargs), len)
+
+    def to_pandas_batches(self, *args, **kwargs):
+        """Yield the batches; the record covers the time spent fetching them, not the caller's work in between."""
+        record = self._session._record(self._query)
+        batches = iter(self._session._run(self._query, lambda: self._df.to_pandas_batches(*args, **kwargs), lambda _: 0, record))
+        while True:
+            started = time.perf_counter()
+            batch = next(batches, None)
+            record.elapsed_ms += (time.perf_counter() - started) * 1000
+            if batch is None:
+                return
+            record.rows += len(batch)
+            yield batch
+
+
+class InstrumentedSession:
+    """Drop-in proxy for a Snowpark ``Session`` that records every query it runs in a ``QueryLog``.
+
+    ``sql(...)`` results (``collect``, ``to_pandas``, ``to_pandas_batches``)
+    and ``write_pandas`` are timed and attributed to the feature set with
+    ``feature()``; the Snowflake query id is read back through
+    ``Session.query_history``. Everything else passes straight through.
+    """
+
+    def __init__(self, session, log):
+        self._session = session
+        self._log = log
+
+    def __getattr__(self, name):
+        return getattr(self._session, name)
+
+    def on(self, session):
+        """The same instrumentation, and log, around another session."""
+        return InstrumentedSession(session, self._log)
+
+    def sql(self, query, *args, **kwargs):
+        return InstrumentedDataFrame(self._session.sql(query, *args, **kwargs), self, query)
+
+    def write_pandas(self, df, table_name, *args, **kwargs):
+        return self._run(
+            f"write_pandas {table_name}",
+            lambda: self._session.write_pandas(df, table_name, *args, **kwargs),
+            lambda _: len(df),
+        )
+
+    @contextmanager
+    def _history(self):
+        try:
+            history = self._session.query_history()
+        except Exception:
+            yield None
+            return
+        with history:
+            yield history
+
+    def _record(self, sql):
+        return QueryRecord(
+            rerun=self._log.rerun,
+            feature=_feature.get(),
+            sql=" ".join(str(sql).split()),
+            started_at=time.time(),
+            elapsed_ms=0.0,
+        )
+
+    def _run(self, sql, call, count_rows, record=None):
+        record = record or self._record(sql)
+        history = None
+        started = time.perf_counter()
+        try:
+            with self._history() as history:
+                result = call()
+            record.rows = count_rows(result)
+            return result
+        except Exception as e:
+            record.error = str(e)
+            raise
+        finally:
+            record.elapsed_ms = (time.perf_counter() - started) * 1000
+            record.query_id = _query_id(history)
+            self._log.add(record)
+
+
+def render_debug_panel(log):
+    """Per-rerun totals by feature, the slowest queries so far, and JSON/CSV export of the whole log."""
+    st.markdown("---")
+    st.subheader("🐞 Query Debug Panel")
+    current = log.to_frame(rerun=log.rerun)
+    if current.empty:
+        st.caption("No queries in this rerun.")
+    else:
+        st.caption(f"This rerun: {len(current)} queries, {current['elapsed_ms'].sum():,.0f} ms in Snowflake.")
+        totals = current.groupby("feature").agg(
+            queries=("sql", "size"), total_ms=("elapsed_ms", "sum"), rows=("rows", "sum")
+        )
+        st.dataframe(totals.sort_values("total_ms", ascending=False), use_container_width=True)
+
+    everything = log.to_frame()
+    if everything.empty:
+        return
+    st.markdown("**Slowest queries this session**")
+    st.dataframe(
+        everything.nlargest(SLOWEST_SHOWN, "elapsed_ms")[["rerun", "feature", "elapsed_ms", "rows", "query_id", "sql"]],
+        use_container_width=True,
+        hide_index=True,
+    )
+    col1, col2 = st.columns(2)
+    with col1:
+        st.download_button("⬇️ Export JSON", log.to_json(), file_name="query_log.json", mime="application/json")
+    with col2:
+        st.download_button("⬇️ Export CSV", log.to_csv(), file_name="query_log.csv", mime="text/csv")
@@ -0,0 +1,154 @@
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from dataclasses import dataclass
+
+import pandas as pd
+
+from bulk_loader import StagedLoad
+from duplicate_check import find_duplicate_rows
+from streaming_ingest import normalize_columns
+from validation import compile_checks, validate_frame
+
+# Sheets parsed and validated at once (separate processes).
+MAX_PARSE_WORKERS = max(1, min(8, (os.cpu_count() or 2) - 1))
+# Sheets loaded into Snowflake at once, each on its own session.
+MAX_LOAD_WORKERS = 3
+# Parser processes start fresh instead of forking the app server with its threads, locks and sessions.
+_PARSE_CONTEXT = multiprocessing.get_context("spawn")
+
+
+@dataclass
+class SheetReport:
+    sheet: str
+    rows: int = 0
+    rejected: int = 0
+    inserted: int = 0
+    updated: int = 0
+    parse_seconds: float = 0.0
+    validate_seconds: float = 0.0
+    load_seconds: float = 0.0
+    status: str = "pending"
+    errors: list = None
+
+
+def _parse_and_validate(path, sheet_name, column_metadata):
+    """Process-pool worker: read one sheet and run the field-level checks on it."""
+    started = time.perf_counter()
+    df = normalize_columns(pd.read_excel(path, sheet_name=sheet_name, engine="openpyxl"))
+    parsed = time.perf_counter()
+    messages = validate_frame(df, compile_checks(column_metadata)).messages
+    return df, messages, parsed - started, time.perf_counter() - parsed
+
+
+def ingest_sheets(path, sheet_names, table_schema, session_pool, merge_keys=None, on_report=None):
+    """Parse, validate and load several sheets of one workbook concurrently.
+
+    Sheets are parsed and field-validated in parallel worker processes. As
+    each one finishes it is handed to a bounded thread pool that runs the
+    set-based duplicate check and a transactional ``StagedLoad`` for it; every
+    loader thread leases one pooled session for all sheets it handles.
+    Sheets load independently, so one failing sheet does not undo the others,
+    and rows repeated across two sheets of the same run are not caught by the
+    duplicate check.
+    Returns one ``SheetReport`` per sheet, in the order given.
+    """
+    reports = {sheet: SheetReport(sheet) for sheet in sheet_names}
+    local = threading.local()
+    sessions = []
+    sessions_lock = threading.Lock()
+
+    def session():
+        if not hasattr(local, "session"):
+            local.session = session_pool.acquire(f"sheet-ingest:{table_schema.fqn}")
+            with sessions_lock:
+                sessions.append(local.session)
+        return local.session
+
+    def load(sheet, df, messages):
+        report = reports[sheet]
+        report.status = "loading"
+        started = time.perf_counter()
+        try:
+            candidates = df.drop(index=list(messages))
+            duplicates = find_duplicate_rows(
+                session(),
+                candidates,
+                table_schema.column_names,
+                table_schema.database,
+                table_schema.schema,
+                table_schema.table,
+            )
+            for idx in duplicates:
+                messages.setdefault(idx, []).append(f"Duplicate row found: {df.loc[idx].to_dict()}")
+            staged_load = StagedLoad(
+                session(), table_schema.database, table_schema.schema, table_schema.table, df.columns, merge_keys
+            )
+            try:
+                staged_load.append(df.drop(index=list(messages)))
+            except Exception:
+                staged_load.discard()
+                raise
+            result = staged_load.commit()
+            report.inserted, report.updated = result.rows_loaded, result.rows_updated
+            report.status = "loaded"
+        except Exception as e:
+            report.status = f"failed: {e}"
+        report.rejected = len(messages)
+        report.errors = [f"Row {idx + 1}: {', '.join(errs)}" for idx, errs in sorted(messages.items())]
+        report.load_seconds = time.perf_counter() - started
+        if on_report is not None:
+            on_report(report)
+
+    column_metadata = table_schema.column_metadata
+    parsers = ProcessPoolExecutor(max_workers=min(MAX_PARSE_WORKERS, len(sheet_names)), mp_context=_PARSE_CONTEXT)
+    try:
+        # On a shared session, loads must not run their transactions side by side
+        load_workers = 1 if session_pool.shared_session else MAX_LOAD_WORKERS
+        with parsers, ThreadPoolExecutor(max_workers=load_workers) as loaders:
+            parsing = {
+                parsers.submit(_parse_and_validate, path, sheet, column_metadata): sheet
+                for sheet in sheet_names
+            }
+            loading = []
+            for future in as_completed(parsing):
+                sheet = parsing[future]
+                report = reports[sheet]
+                try:
+                    df, messages, report.parse_seconds, report.validate_seconds = future.result()
+                except Exception as e:
+                    report.status = f"failed: {e}"
+                    if on_report is not None:
+                        on_report(report)
+                    continue
+                report.rows = len(df)
+                report.status = "validated"
+                loading.append(loaders.submit(load, sheet, df, messages))
+            for future in loading:
+                future.result()
+    finally:
+        for leased in sessions:
+            session_pool.release(leased)
+
+    return [reports[sheet] for sheet in sheet_names]
+
+
+def report_frame(reports):
+    return pd.DataFrame(
+        [
+            {
+                "Sheet": r.sheet,
+                "Rows": r.rows,
+                "Rejected": r.rejected,
+                "Inserted": r.inserted,
+                "Updated": r.updated,
+                "Parse (s)": round(r.parse_seconds, 2),
+                "Validate (s)": round(r.validate_seconds, 2),
+                "Load (s)": round(r.load_seconds, 2),
+                "Status": r.status,
+            }
+            for r in reports
+        ]
+    )
@@ -1,17 +1,309 @@
+import threading
+import time
+from contextlib import contextmanager
+
 from snowflake.snowpark import Session
+from snowflake.snowpark.context import get_active_session
 import streamlit as st
+from streamlit.connections.util import running_in_sis
+
+# Snowflake sessions kept open at once across all users of this app server.
+MAX_POOL_SIZE = 8
+# Of those, sessions lent to background work (upload jobs, sheet loads, the catalog index) at once;
+# the rest stay free for interactive users.
+MAX_LEASED_SESSIONS = 4
+# A session is pinged with SELECT 1 before reuse when it has not been checked for this long.
+HEALTH_CHECK_INTERVAL = 60
+# Sessions unused for this long are closed by the reaper.
+IDLE_TIMEOUT = 15 * 60
+# How often the reaper looks for idle sessions.
+REAP_INTERVAL = 60
+# How long acquire() waits for a free slot before giving up.
+ACQUIRE_TIMEOUT = 30
+# Prefix of the QUERY_TAG set on every pooled session.
+QUERY_TAG_PREFIX = "PRISM_MASTER_DATA"
+# Connection in connections.toml used when secrets.toml has no Snowflake settings.
+CONNECTION_NAME = "snowflake"
+
+
+def _secrets():
+    try:
+        return st.secrets.to_dict()
+    except FileNotFoundError:
+        # No secrets.toml at all: settings come from connections.toml instead
+        return {}
+
 
 def get_snowflake_session():
+    """Session from the flat account/user/... keys at the top level of ``secrets.toml``."""
+    secrets = _secrets()
     connection_parameters = {
-        "account": st.secrets["account"],
-        "user": st.secrets["user"],
-        "role": st.secrets["role"],
-        "warehouse": st.secrets["warehouse"],
-        "database": st.secrets["database"],
-        "schema": st.secrets["schema"],
-        "authenticator": "externalbrowser",
-        #"authenticator": "oauth",
-        # "token": st.secrets["token"],  # uncomment if you're passing an OAuth access token
-        #"password": st.secrets["password"],
+        key: secrets[key]
+        for key in ("account", "user", "role", "warehouse", "database", "schema", "authenticator", "password", "token")
+        if key in secrets
     }
     return Session.builder.configs(connection_parameters).create()
+
+
+def create_session():
+    """Open a new session, resolving settings the way ``st.connection("snowflake")`` does.
+
+    Inside Snowflake, where no other session can be opened, the app's own
+    active session is returned. Elsewhere the ``[connections.snowflake]``
+    secrets come first, then the flat secrets this app used before, then the
+    ``snowflake`` connection in ``~/.snowflake/connections.toml``. No
+    interactive login is ever assumed.
+    """
+    if running_in_sis():
+        return get_active_session()
+    secrets = _secrets()
+    connections = secrets.get("connections", {})
+    if "snowflake" in connections:
+        return Session.builder.configs(dict(connections["snowflake"])).create()
+    if "account" in secrets:
+        return get_snowflake_session()
+    return Session.builder.config("connection_name", CONNECTION_NAME).create()
+
+
+class PoolExhaustedError(Exception):
+    pass
+
+
+class PooledSession:
+    def __init__(self, session):
+        self.session = session
+        self.owner = None
+        self.in_use = 0  # reruns currently running on this user session
+        self.last_used = time.monotonic()
+        self.last_checked = time.monotonic()
+
+
+def _close_quietly(session):
+    # Inside Snowflake every pooled session is the app's own, which must stay open.
+    if session is None or running_in_sis():
+        return
+    try:
+        session.close()
+    except Exception:
+        pass
+
+
+class SessionPool:
+    """A bounded set of Snowflake sessions shared by every user and rerun of the app.
+
+    ``session_for(user)`` hands each user the same session on every rerun
+    until ``done_with(user)``; ``lease(owner)`` lends a session exclusively,
+    for work such as upload jobs that runs its own transaction. Sessions are
+    pinged before reuse once ``HEALTH_CHECK_INTERVAL`` has passed and are
+    transparently replaced when the ping fails; a daemon thread closes
+    sessions left idle for ``IDLE_TIMEOUT``. When the pool is full, the least
+    recently used idle session, or user session no rerun is running on, is
+    closed to make room; when there is none, both calls wait for a session
+    to be handed back. At most ``max_leased`` sessions are lent at once, so
+    background work queues behind that cap instead of crowding out users.
+
+    With ``shared_session`` (inside Snowflake, where ``create_session``
+    always returns the app's one session) nothing is exclusive: leases run
+    on the same connection as the users, so they are handed out one at a
+    time and callers should not start work that outlives a rerun.
+    """
+
+    def __init__(self, factory=create_session, max_size=MAX_POOL_SIZE, idle_timeout=IDLE_TIMEOUT,
+                 max_leased=MAX_LEASED_SESSIONS, shared_session=False):
+        self._factory = factory
+        self._max_size = max_size
+        self._max_leased = 1 if shared_session else max(1, min(max_leased, max_size - 1))
+        self.shared_session = shared_session
+        self._idle_timeout = idle_timeout
+        self._by_user = {}  # user -> PooledSession
+        self._idle = []  # returned leases, ready for the next acquire()
+        self._leased = {}  # id(session) -> PooledSession
+        self._cond = threading.Condition()
+        threading.Thread(target=self._reap_forever, name="session-reaper", daemon=True).start()
+
+    @property
+    def size(self):
+        return len(self._by_user) + len(self._idle) + len(self._leased)
+
+    def stats(self):
+        with self._cond:
+            return {"users": len(self._by_user), "idle": len(self._idle), "leased": len(self._leased)}
+
+    def session_for(self, user, timeout=ACQUIRE_TIMEOUT):
+        """Return ``user``'s own session, opening or reconnecting it only when needed.
+
+        The session cannot be evicted until a matching ``done_with(user)``.
+        Raises ``PoolExhaustedError`` when no slot frees up within ``timeout``.
+        """
+        with self._cond:
+            pooled = self._by_user.get(user)
+            if pooled is None:
+                pooled = self._wait_for_slot(timeout)
+                # Another rerun of the same user may have got a session while this one waited.
+                existing = self._by_user.get(user)
+                if existing is not None:
+                    if pooled.session is not None:
+                        self._idle.append(pooled)
+                    pooled = existing
+                self._by_user[user] = pooled
+            pooled.in_use += 1
+        try:
+            self._checked(pooled)
+        except Exception:
+            with self._cond:
+                pooled.in_use -= 1
+                if not pooled.in_use and self._by_user.get(user) is pooled:
+                    del self._by_user[user]
+                self._cond.notify_all()
+            raise
+        self._tag(pooled, user)
+        return pooled.session
+
+    def done_with(self, user):
+        """Hand back a ``session_for(user)`` session; it stays ``user``'s but may be evicted once no rerun uses it."""
+        with self._cond:
+            pooled = self._by_user.get(user)
+            if pooled is None or not pooled.in_use:
+                return
+            pooled.in_use -= 1
+            pooled.last_used = time.monotonic()
+            if not pooled.in_use:
+                self._cond.notify_all()
+
+    @contextmanager
+    def user_session(self, user, timeout=ACQUIRE_TIMEOUT):
+        session = self.session_for(user, timeout)
+        try:
+            yield session
+        finally:
+            self.done_with(user)
+
+    def acquire(self, owner, timeout=ACQUIRE_TIMEOUT):
+        """Lend a session to ``owner`` until ``release``, exclusively unless ``shared_session``.
+
+        Raises ``PoolExhaustedError`` when none is free within ``timeout``
+        seconds; ``timeout=None`` waits as long as it takes.
+        """
+        with self._cond:
+            pooled = self._wait_for_slot(timeout, lease=True)
+            self._leased[id(pooled)] = pooled
+        try:
+            self._checked(pooled)
+        except Exception:
+            with self._cond:
+                self._leased.pop(id(pooled), None)
+                self._cond.notify_all()
+            raise
+        self._tag(pooled, owner)
+        return pooled.session
+
+    def release(self, session):
+        with self._cond:
+            pooled = next((p for p in self._leased.values() if p.session is session), None)
+            if pooled is None:
+                return
+            del self._leased[id(pooled)]
+            pooled.last_used = time.monotonic()
+            self._idle.append(pooled)
+            # Wakes waiters for a free slot as well as those waiting under the lease cap
+            self._cond.notify_all()
+
+    @contextmanager
+    def lease(self, owner, timeout=ACQUIRE_TIMEOUT):
+        session = self.acquire(owner, timeout)
+        try:
+            yield session
+        finally:
+            self.release(session)
+
+    def reap_idle(self):
+        """Close user and returned sessions that have not been used for ``idle_timeout`` seconds."""
+        cutoff = time.monotonic() - self._idle_timeout
+        with self._cond:
+            stale = [p for p in self._idle if p.last_used < cutoff]
+            self._idle = [p for p in self._idle if p.last_used >= cutoff]
+            for user in [u for u, p in self._by_user.items() if not p.in_use and p.last_used < cutoff]:
+                stale.append(self._by_user.pop(user))
+            if stale:
+                self._cond.notify_all()
+        for pooled in stale:
+            _close_quietly(pooled.session)
+        return len(stale)
+
+    def close_all(self):
+        with self._cond:
+            pooled = list(self._by_user.values()) + self._idle + list(self._leased.values())
+            self._by_user, self._idle, self._leased = {}, [], {}
+        for p in pooled:
+            _close_quietly(p.session)
+
+    def _reap_forever(self):
+        while True:
+            time.sleep(REAP_INTERVAL)
+            self.reap_idle()
+
+    def _take_idle(self):
+        return self._idle.pop() if self._idle else None
+
+    def _wait_for_slot(self, timeout, lease=False):
+        """An idle session, or room for a new one (opened lazily by ``_checked``); call with the lock held."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            if not lease or len(self._leased) < self._max_leased:
+                pooled = self._take_idle()
+                if pooled is not None:
+                    return pooled
+                if self.size < self._max_size or self._evict_one():
+                    return PooledSession(None)
+            remaining = None if deadline is None else deadline - time.monotonic()
+            if remaining is not None and remaining <= 0:
+                if lease and self.shared_session:
+                    raise PoolExhaustedError("The app's Snowflake session is busy with other background work.")
+                if lease and len(self._leased) >= self._max_leased:
+                    raise PoolExhaustedError(f"All {self._max_leased} Snowflake sessions for background work are busy.")
+                raise PoolExhaustedError(f"All {self._max_size} Snowflake sessions are busy.")
+            self._cond.wait(remaining)
+
+    def _evict_one(self):
+        # Only sessions nobody is running on; a user session in use belongs to a rerun in progress.
+        candidates = self._idle + [p for p in self._by_user.values() if not p.in_use]
+        if not candidates:
+            return False
+        victim = min(candidates, key=lambda p: p.last_used)
+        if victim in self._idle:
+            self._idle.remove(victim)
+        else:
+            del self._by_user[next(u for u, p in self._by_user.items() if p is victim)]
+        if victim.session is not None:
+            threading.Thread(target=_close_quietly, args=(victim.session,), daemon=True).start()
+        return True
+
+    def _checked(self, pooled):
+        """Open ``pooled``'s session if needed, or ping it and reconnect if the ping fails."""
+        now = time.monotonic()
+        if pooled.session is not None and now - pooled.last_checked >= HEALTH_CHECK_INTERVAL:
+            try:
+                pooled.session.sql("SELECT 1").collect()
+            except Exception:
+                _close_quietly(pooled.session)
+                pooled.session = None
+        if pooled.session is None:
+            pooled.session = self._factory()
+            pooled.owner = None
+        pooled.last_checked = pooled.last_used = now
+        return pooled
+
+    def _tag(self, pooled, owner):
+        # Setting query_tag is a round trip, so only do it when the owner changes.
+        if pooled.owner == owner:
+            return
+        pooled.owner = owner
+        try:
+            pooled.session.query_tag = f"{QUERY_TAG_PREFIX}:{owner}"
+        except Exception:
+            pass
+
+
+@st.cache_resource
+def get_session_pool():
+    return SessionPool(shared_session=running_in_sis())
@@ -0,0 +1,104 @@
+import datetime
+import decimal
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+
+@dataclass(frozen=True)
+class Sql:
+    """SQL text with ``?`` placeholders and the values bound to them, in order.
+
+    Values never appear in the text, so running the same statement with
+    other values sends identical text to Snowflake (which can then reuse
+    the compiled plan and the result cache) and no value needs quoting.
+    Instances are hashable and serve as cache keys.
+    """
+
+    text: str
+    params: tuple = ()
+
+    def __str__(self):
+        return self.text
+
+
+def ident(name):
+    """``name`` as a quoted identifier: exact case, and safe with spaces or quotes in it."""
+    return '"' + str(name).replace('"', '""') + '"'
+
+
+def qualified(*parts):
+    """Quoted ``"DB"."SCHEMA"."TABLE"`` (or any shorter path)."""
+    return ".".join(ident(part) for part in parts)
+
+
+def bind_value(value):
+    """Convert a pandas or numpy value into a plain Python value the connector can bind."""
+    if value is None or (not isinstance(value, (list, tuple, dict)) and pd.isna(value)):
+        return None
+    if isinstance(value, pd.Timestamp):
+        return value.to_pydatetime()
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, (str, bool, int, float, decimal.Decimal, datetime.date, datetime.time)):
+        return value
+    return str(value)
+
+
+def join(fragments, separator=" "):
+    """Concatenate ``Sql`` fragments (or plain strings), keeping their bind values in order."""
+    fragments = [f if isinstance(f, Sql) else Sql(f) for f in fragments]
+    return Sql(
+        separator.join(f.text for f in fragments if f.text),
+        tuple(param for f in fragments for param in f.params),
+    )
+
+
+def where(clauses):
+    """``WHERE c1 AND c2 ...`` for a list of ``Sql`` predicates; empty without any."""
+    if not clauses:
+        return Sql("")
+    return join([Sql("WHERE"), join(clauses, " AND ")])
+
+
+def equals(column, value):
+    """``"COL" = ?``, or ``"COL" IS NULL`` for a missing value."""
+    value = bind_value(value)
+    if value is None:
+        return Sql(f"{ident(column)} IS NULL")
+    return Sql(f"{ident(column)} = ?", (value,))
+
+
+def between(expression, low, high):
+    """``expression BETWEEN ? AND ?``; ``expression`` is SQL text such as ``"COL"::DATE``."""
+    return Sql(f"{expression} BETWEEN ? AND ?", (bind_value(low), bind_value(high)))
+
+
+def seek_predicate(sort_keys, anchor):
+    """``(k1, k2, ...) > (v1, v2, ...)`` spelled out so it can use the key ordering."""
+    clauses = []
+    for i, key in enumerate(sort_keys):
+        parts = [equals(k, v) for k, v in zip(sort_keys[:i], anchor[:i])]
+        parts.append(Sql(f"{ident(key)} > ?", (bind_value(anchor[i]),)))
+        clauses.append(join([Sql("("), join(parts, " AND "), Sql(")")], ""))
+    return join([Sql("("), join(clauses, " OR "), Sql(")")], "")
+
+
+def in_rows(columns, rows):
+    """``"K" IN (?, ?)`` for one column, ``("K1", "K2") IN ((?, ?), (?, ?))`` for several."""
+    if len(columns) == 1:
+        values = tuple(bind_value(row[0]) for row in rows)
+        return Sql(f"{ident(columns[0])} IN ({', '.join(['?'] * len(values))})", values)
+    row_marks = "(" + ", ".join(["?"] * len(columns)) + ")"
+    return Sql(
+        "(" + ", ".join(ident(col) for col in columns) + f") IN ({', '.join([row_marks] * len(rows))})",
+        tuple(bind_value(value) for row in rows for value in row),
+    )
+
+
+def run(session, query):
+    """``session.sql`` for a ``Sql`` (with its bind values) or for plain statement text."""
+    if isinstance(query, Sql):
+        return session.sql(query.text, params=list(query.params)) if query.params else session.sql(query.text)
+    return session.sql(query)
@@ -0,0 +1,42 @@
+import uuid
+
+from sql_builder import qualified
+
+
+def temp_table_name(prefix="PRISM_TMP"):
+    return f"{prefix}_{uuid.uuid4().hex[:12].upper()}"
+
+
+def stage_dataframe(session, df, database_name, schema_name, prefix="PRISM_TMP"):
+    """Upload ``df`` in one bulk operation into a new temporary table and return its qualified name."""
+    table_name = temp_table_name(prefix)
+    append_staged(session, df, database_name, schema_name, table_name)
+    return qualified(database_name, schema_name, table_name)
+
+
+def append_staged(session, df, database_name, schema_name, table_name):
+    """Add ``df`` to temporary table ``table_name``, creating it on first use."""
+    session.write_pandas(
+        df,
+        table_name,
+        database=database_name,
+        schema=schema_name,
+        auto_create_table=True,
+        table_type="temporary",
+        quote_identifiers=True,
+    )
+
+
+def drop_staged(session, qualified_name):
+    try:
+        session.sql(f"DROP TABLE IF EXISTS {qualified_name}").collect()
+    except Exception:
+        # Temporary tables disappear with the session anyway.
+        pass
+
+
+def affected_rows(result, label):
+    """Read a DML counter such as ``"number of rows inserted"`` from a collected result."""
+    if not result:
+        return 0
+    return int(result[0].as_dict().get(label) or 0)
@@ -0,0 +1,181 @@
+import itertools
+import os
+import tempfile
+import time
+from dataclasses import dataclass, field
+
+import openpyxl
+import pandas as pd
+
+from bulk_loader import LoadResult, StagedLoad
+from validation import validate_rows
+
+# Rows read, validated and staged per step.
+CHUNK_SIZE = 50_000
+# Rows shown in the upload preview.
+PREVIEW_ROWS = 100
+# Files larger than this are streamed by default.
+STREAMING_THRESHOLD = 50 * 1024 * 1024
+# Rejected-row messages kept for the report; the count is always exact.
+MAX_REPORTED_ERRORS = 1000
+
+
+class IngestCancelled(Exception):
+    pass
+
+
+@dataclass
+class IngestProgress:
+    rows_read: int = 0
+    rows_staged: int = 0
+    rows_rejected: int = 0
+    fraction: float = 0.0
+    started: float = field(default_factory=time.perf_counter)
+    errors: list = field(default_factory=list)
+
+    @property
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+    @property
+    def rows_per_second(self):
+        return self.rows_read / self.elapsed if self.elapsed else 0.0
+
+
+def normalize_columns(df):
+    df.columns = df.columns.astype(str).str.strip().str.upper()
+    return df
+
+
+def _file_size(file):
+    size = getattr(file, "size", None)
+    if size is None:
+        position = file.tell()
+        size = file.seek(0, 2)
+        file.seek(position)
+    return size or 1
+
+
+def spool_upload(file):
+    """Copy an uploaded file to a temporary file on disk and return its path."""
+    suffix = os.path.splitext(file.name)[1]
+    with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as tmp:
+        file.seek(0)
+        for block in iter(lambda: file.read(1024 * 1024), b""):
+            tmp.write(block)
+    file.seek(0)
+    return tmp.name
+
+
+def preview_csv(file, rows=PREVIEW_ROWS):
+    df = normalize_columns(pd.read_csv(file, nrows=rows, dtype=str))
+    file.seek(0)
+    return df
+
+
+def read_csv_chunks(file, chunk_size=CHUNK_SIZE):
+    """Yield ``(chunk, fraction done)`` pairs; only one chunk is held in memory at a time."""
+    total = _file_size(file)
+    file.seek(0)
+    for chunk in pd.read_csv(file, chunksize=chunk_size, dtype=str):
+        yield normalize_columns(chunk), min(file.tell() / total, 1.0)
+
+
+def xlsx_sheet_names(file):
+    workbook = openpyxl.load_workbook(file, read_only=True)
+    try:
+        return workbook.sheetnames
+    finally:
+        workbook.close()
+        file.seek(0)
+
+
+def _xlsx_columns(header):
+    return [
+        str(name).strip().upper() if name is not None else f"COLUMN_{i + 1}"
+        for i, name in enumerate(header)
+    ]
+
+
+def preview_xlsx(file, sheet_name, rows=PREVIEW_ROWS):
+    workbook = openpyxl.load_workbook(file, read_only=True, data_only=True)
+    try:
+        values = workbook[sheet_name].iter_rows(values_only=True)
+        header = next(values, None)
+        if header is None:
+            return pd.DataFrame()
+        return pd.DataFrame(list(itertools.islice(values, rows)), columns=_xlsx_columns(header))
+    finally:
+        workbook.close()
+        file.seek(0)
+
+
+def read_xlsx_chunks(file, sheet_name, chunk_size=CHUNK_SIZE):
+    """Stream a sheet through openpyxl's read-only row iterator, ``chunk_size`` rows at a time."""
+    workbook = openpyxl.load_workbook(file, read_only=True, data_only=True)
+    try:
+        sheet = workbook[sheet_name]
+        values = sheet.iter_rows(values_only=True)
+        header = next(values, None)
+        if header is None:
+            return
+        columns = _xlsx_columns(header)
+        total = max((sheet.max_row or 0) - 1, 1)
+        start = 0
+        while True:
+            batch = list(itertools.islice(values, chunk_size))
+            if not batch:
+                break
+            index = pd.RangeIndex(start, start + len(batch))
+            yield pd.DataFrame(batch, columns=columns, index=index), min((start + len(batch)) / total, 1.0)
+            start += len(batch)
+    finally:
+        workbook.close()
+
+
+def ingest_chunks(session, chunks, table_schema, merge_keys=None, on_progress=None, should_cancel=None):
+    """Validate and stage ``chunks`` one by one, then publish them to the table in one transaction.
+
+    Returns ``(LoadResult, IngestProgress)``. Rejected rows are skipped and
+    reported; a cancellation or error discards everything staged so far.
+    """
+    progress = IngestProgress()
+    load = None
+    try:
+        for chunk, fraction in chunks:
+            if should_cancel is not None and should_cancel():
+                raise IngestCancelled()
+            if load is None:
+                load = StagedLoad(
+                    session,
+                    table_schema.database,
+                    table_schema.schema,
+                    table_schema.table,
+                    chunk.columns,
+                    merge_keys,
+                )
+            # Rows staged from earlier chunks count as existing for the duplicate check.
+            also_in = {load.staged_table: load.columns} if load.rows_staged else None
+            row_errors = validate_rows(session, chunk, table_schema, also_in=also_in)
+            load.append(chunk.drop(index=list(row_errors)))
+
+            progress.rows_read += len(chunk)
+            progress.rows_staged = load.rows_staged
+            progress.rows_rejected += len(row_errors)
+            progress.fraction = fraction
+            for idx, errors in row_errors.items():
+                if len(progress.errors) >= MAX_REPORTED_ERRORS:
+                    break
+                progress.errors.append(f"Row {idx + 1}: {', '.join(errors)}")
+            if on_progress is not None:
+                on_progress(progress)
+
+        if should_cancel is not None and should_cancel():
+            raise IngestCancelled()
+        result = load.commit() if load is not None else LoadResult(0, 0, progress.elapsed)
+    except BaseException:
+        if load is not None:
+            load.discard()
+        raise
+    progress.fraction = 1.0
+    return result, progress
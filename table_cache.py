@@ -0,0 +1,94 @@
+import time
+from dataclasses import dataclass, field
+
+import streamlit as st
+
+from page_cache import get_page_cache
+from sql_builder import Sql, ident, run
+
+# How long a table's LAST_ALTERED / ROW_COUNT reading is trusted before it is read again.
+FRESHNESS_CHECK_INTERVAL = 15
+# session_state caches whose keys start with the table's fully qualified name.
+TABLE_KEYED_CACHES = ("row_counts", "page_anchors", "filter_value_cache")
+
+
+@dataclass
+class TableVersion:
+    last_altered: object
+    row_count: int
+    checked_at: float = field(default_factory=time.monotonic)
+
+    def same_as(self, other):
+        return (self.last_altered, self.row_count) == (other.last_altered, other.row_count)
+
+
+def _versions():
+    return st.session_state.setdefault("table_versions", {})
+
+
+def _own_writes():
+    # table fqn -> LAST_ALTERED the table had before this app wrote to it
+    return st.session_state.setdefault("own_table_writes", {})
+
+
+def _drop_cached_data(table_fqn):
+    get_page_cache().invalidate(table_fqn)
+    for state_key in TABLE_KEYED_CACHES:
+        cache = st.session_state.get(state_key, {})
+        for key in [key for key in cache if key[0] == table_fqn]:
+            del cache[key]
+
+
+def _read_version(session, database_name, schema_name, table_name):
+    rows = run(session, Sql(f"""
+        SELECT LAST_ALTERED, ROW_COUNT
+        FROM {ident(database_name)}.INFORMATION_SCHEMA.TABLES
+        WHERE TABLE_SCHEMA = ? AND TABLE_NAME = ?
+    """, (schema_name, table_name))).collect()
+    if not rows:
+        return TableVersion(None, None)
+    return TableVersion(rows[0]["LAST_ALTERED"], rows[0]["ROW_COUNT"])
+
+
+def remember_version(table_fqn, last_altered, row_count):
+    """Record a version read as part of another query, so the next check has something to compare with."""
+    _versions()[table_fqn] = TableVersion(last_altered, row_count)
+
+
+def table_version(session, database_name, schema_name, table_name):
+    """Current ``TableVersion`` of a table, re-read at most every ``FRESHNESS_CHECK_INTERVAL`` seconds.
+
+    When a fresh reading differs from the previous one, someone else has
+    written to the table, and this session's cached counts, pages, anchors
+    and filter choices for it are dropped. Other tables keep theirs.
+    """
+    table_fqn = f"{database_name}.{schema_name}.{table_name}"
+    versions = _versions()
+    known = versions.get(table_fqn)
+    if known is not None and time.monotonic() - known.checked_at < FRESHNESS_CHECK_INTERVAL:
+        return known
+    current = _read_version(session, database_name, schema_name, table_name)
+    if known is not None and not current.same_as(known):
+        _drop_cached_data(table_fqn)
+    versions[table_fqn] = current
+    return current
+
+
+def invalidate_table(table_fqn):
+    """Forget counts, page anchors, cached pages and filter choices of a table after this app wrote to it."""
+    _drop_cached_data(table_fqn)
+    # The next reading is taken as the new baseline instead of a change by someone else.
+    known = _versions().pop(table_fqn, None)
+    # With several writes before the next check, the version before the first one counts.
+    _own_writes().setdefault(table_fqn, known.last_altered if known is not None else None)
+
+
+def consume_own_write(table_fqn, last_altered):
+    """True when ``last_altered`` is the version this app's own DML moved the table away from.
+
+    The record is dropped by the first check after the write either way, so
+    a write that left the table unchanged cannot vouch for a later change by
+    someone else. Without a known pre-write version the answer is False.
+    """
+    before = _own_writes().pop(table_fqn, None)
+    return before is not None and before == last_altered
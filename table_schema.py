@@ -0,0 +1,131 @@
+from dataclasses import dataclass
+
+import streamlit as st
+
+from sql_builder import Sql, ident, qualified, run
+from table_cache import consume_own_write, remember_version, table_version
+
+
+@dataclass(frozen=True)
+class ColumnInfo:
+    name: str
+    data_type: str
+    nullable: bool
+    max_length: int = None
+    precision: int = None
+    scale: int = None
+
+    @property
+    def sql_type(self):
+        """Type to cast staged text values to, e.g. ``NUMBER(12,2)`` or ``VARCHAR(40)``."""
+        data_type = str(self.data_type).upper()
+        if data_type in ("NUMBER", "DECIMAL", "NUMERIC") and self.precision is not None:
+            return f"NUMBER({int(self.precision)},{int(self.scale or 0)})"
+        if data_type == "TEXT":
+            return f"VARCHAR({int(self.max_length)})" if self.max_length else "VARCHAR"
+        return data_type
+
+
+@dataclass
+class TableSchema:
+    """Everything the viewer, editor and uploader need to know about one table."""
+
+    database: str
+    schema: str
+    table: str
+    columns: list
+    primary_key: list
+    last_altered: object = None
+    row_count: int = None
+
+    @property
+    def fqn(self):
+        return f"{self.database}.{self.schema}.{self.table}"
+
+    @property
+    def sql_name(self):
+        """Quoted ``"DB"."SCHEMA"."TABLE"`` for use in statements; ``fqn`` stays the display name and cache key."""
+        return qualified(self.database, self.schema, self.table)
+
+    @property
+    def column_names(self):
+        return [col.name for col in self.columns]
+
+    @property
+    def column_metadata(self):
+        """Columns in ``INFORMATION_SCHEMA.COLUMNS`` shape, as consumed by ``validation.compile_checks``."""
+        return [
+            {
+                "COLUMN_NAME": col.name,
+                "DATA_TYPE": col.data_type,
+                "IS_NULLABLE": "YES" if col.nullable else "NO",
+                "CHARACTER_MAXIMUM_LENGTH": col.max_length,
+                "NUMERIC_PRECISION": col.precision,
+                "NUMERIC_SCALE": col.scale,
+            }
+            for col in self.columns
+        ]
+
+
+def primary_key_columns(session, database_name, schema_name, table_name):
+    rows = session.sql(f"SHOW PRIMARY KEYS IN TABLE {qualified(database_name, schema_name, table_name)}").collect()
+    return [row["column_name"] for row in sorted(rows, key=lambda row: row["key_sequence"])]
+
+
+def load_table_schema(session, database_name, schema_name, table_name):
+    rows = run(session, Sql(f"""
+        SELECT c.COLUMN_NAME, c.DATA_TYPE, c.IS_NULLABLE,
+               c.CHARACTER_MAXIMUM_LENGTH, c.NUMERIC_PRECISION, c.NUMERIC_SCALE,
+               t.LAST_ALTERED, t.ROW_COUNT
+        FROM {ident(database_name)}.INFORMATION_SCHEMA.COLUMNS c
+        JOIN {ident(database_name)}.INFORMATION_SCHEMA.TABLES t
+          ON t.TABLE_SCHEMA = c.TABLE_SCHEMA AND t.TABLE_NAME = c.TABLE_NAME
+        WHERE c.TABLE_SCHEMA = ? AND c.TABLE_NAME = ?
+        ORDER BY c.ORDINAL_POSITION
+    """, (schema_name, table_name))).collect()
+    columns = [
+        ColumnInfo(
+            name=row["COLUMN_NAME"],
+            data_type=row["DATA_TYPE"],
+            nullable=row["IS_NULLABLE"] == "YES",
+            max_length=row["CHARACTER_MAXIMUM_LENGTH"],
+            precision=row["NUMERIC_PRECISION"],
+            scale=row["NUMERIC_SCALE"],
+        )
+        for row in rows
+    ]
+    return TableSchema(
+        database=database_name,
+        schema=schema_name,
+        table=table_name,
+        columns=columns,
+        primary_key=primary_key_columns(session, database_name, schema_name, table_name),
+        last_altered=rows[0]["LAST_ALTERED"] if rows else None,
+        row_count=rows[0]["ROW_COUNT"] if rows else None,
+    )
+
+
+def get_table_schema(session, database_name, schema_name, table_name):
+    """Return the cached ``TableSchema``, rebuilding it when ``LAST_ALTERED`` has moved.
+
+    The check shares ``table_cache.table_version`` with the data caches, so
+    one cheap ``INFORMATION_SCHEMA.TABLES`` lookup per interval covers both.
+    A move away from the version this app's own DML started from (see
+    ``invalidate_table``) cannot change the columns and is adopted without
+    a reload.
+    """
+    schemas = st.session_state.setdefault("table_schemas", {})
+    key = (database_name, schema_name, table_name)
+    cached = schemas.get(key)
+    if cached is not None:
+        version = table_version(session, database_name, schema_name, table_name)
+        own_write = consume_own_write(cached.fqn, cached.last_altered)
+        if version.last_altered == cached.last_altered:
+            return cached
+        if own_write:
+            cached.last_altered, cached.row_count = version.last_altered, version.row_count
+            return cached
+    table_schema = load_table_schema(session, database_name, schema_name, table_name)
+    remember_version(table_schema.fqn, table_schema.last_altered, table_schema.row_count)
+    schemas[key] = table_schema
+    return table_schema
@@ -0,0 +1,60 @@
+import pandas as pd
+
+from change_set import build_change_set
+
+COLUMNS = ["ID", "QTY", "NAME"]
+
+
+def _grid(original):
+    """The frame the data editor is given: integers made nullable, plus a blank row for inserts."""
+    nullable_ints = {col: "Int64" for col in COLUMNS if pd.api.types.is_integer_dtype(original[col])}
+    return original.astype(nullable_ints).reindex(range(len(original) + 1))
+
+
+def _original():
+    return pd.DataFrame({"ID": [1, 2, 3], "QTY": [10, 20, 30], "NAME": ["a", "b", None]})
+
+
+def test_clearing_an_integer_cell_is_an_update():
+    original = _original()
+    edited = _grid(original)
+    edited.loc[1, "QTY"] = pd.NA
+
+    change_set = build_change_set(original, edited, COLUMNS, ["ID"])
+
+    assert change_set.update_keys["ID"].tolist() == [2]
+    assert change_set.changed.loc[1].tolist() == [False, True, False]
+    assert change_set.updates.loc[1, "QTY"] is pd.NA
+    assert change_set.inserts.empty
+
+
+def test_filling_a_missing_value_is_an_update():
+    original = _original()
+    edited = _grid(original)
+    edited.loc[2, "NAME"] = "c"
+
+    change_set = build_change_set(original, edited, COLUMNS, ["ID"])
+
+    assert change_set.update_keys["ID"].tolist() == [3]
+    assert change_set.changed.loc[2].tolist() == [False, False, True]
+
+
+def test_untouched_rows_with_missing_values_are_not_updates():
+    original = _original()
+
+    change_set = build_change_set(original, _grid(original), COLUMNS, ["ID"])
+
+    assert change_set.is_empty()
+    assert change_set.changed.dtypes.eq(bool).all()
+
+
+def test_ticked_rows_are_deleted_not_updated():
+    original = _original()
+    edited = _grid(original)
+    edited["DELETE"] = [False, True, False, False]
+    edited.loc[1, "QTY"] = pd.NA
+
+    change_set = build_change_set(original, edited, COLUMNS, ["ID"], delete_column="DELETE")
+
+    assert change_set.updates.empty
+    assert change_set.deletes["ID"].tolist() == [2]
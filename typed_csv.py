@@ -0,0 +1,145 @@
+import csv
+import time
+from dataclasses import dataclass, field
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pa_csv
+
+from validation import BOOLEAN_TYPES, DATE_TYPES, FIXED_POINT_TYPES, FLOAT_TYPES
+
+# Bytes of the file each parser thread works on at a time.
+PARSE_BLOCK_SIZE = 16 * 1024 * 1024
+# Text columns with at most this share of distinct values become pandas categoricals.
+CATEGORY_MAX_RATIO = 0.5
+# Timestamp types parsed natively; zoned ones stay text and are checked by validation.
+NAIVE_TIMESTAMP_TYPES = {"TIMESTAMP", "TIMESTAMP_NTZ", "DATETIME"}
+# Decimals with more digits than a float64 holds exactly stay text.
+MAX_FLOAT_PRECISION = 15
+# Sizes of an empty Python str, an object-column pointer and a NaN float, for the untyped estimate.
+_PY_STR_BYTES, _POINTER_BYTES, _PY_NAN_BYTES = 49, 8, 24
+
+
+@dataclass
+class ParseReport:
+    rows: int = 0
+    seconds: float = 0.0
+    threads: int = 0
+    memory_bytes: int = 0
+    untyped_bytes: int = 0  # estimated size of the same data parsed by plain ``pd.read_csv``
+    typed_columns: list = field(default_factory=list)
+    category_columns: list = field(default_factory=list)
+    text_fallback_columns: list = field(default_factory=list)  # values did not fit the column type
+
+    @property
+    def memory_saved(self):
+        return max(self.untyped_bytes - self.memory_bytes, 0)
+
+
+def arrow_type(col):
+    """Arrow type a CSV column for ``col`` (a ``ColumnInfo``) is parsed to, or None to keep it as text."""
+    data_type = str(col.data_type).upper()
+    if data_type in FIXED_POINT_TYPES:
+        if not col.scale:
+            return pa.int64()
+        return pa.float64() if (col.precision or 38) <= MAX_FLOAT_PRECISION else None
+    if data_type in FLOAT_TYPES:
+        return pa.float64()
+    if data_type in DATE_TYPES:
+        return pa.date32()
+    if data_type in NAIVE_TIMESTAMP_TYPES:
+        return pa.timestamp("ns")
+    if data_type in BOOLEAN_TYPES:
+        return pa.bool_()
+    return None
+
+
+def _read_header(file):
+    line = file.readline().decode("utf-8-sig")
+    file.seek(0)
+    return next(csv.reader([line]), [])
+
+
+def _untyped_bytes(text, parsed):
+    """What ``pd.read_csv`` would take for this column: 8-byte numbers, 1-byte booleans, otherwise Python str objects."""
+    if parsed is not None and (pa.types.is_integer(parsed.type) or pa.types.is_floating(parsed.type)):
+        return len(text) * 8
+    nulls = text.null_count
+    if parsed is not None and pa.types.is_boolean(parsed.type) and not nulls:
+        return len(text)
+    chars = pc.sum(pc.binary_length(text)).as_py() or 0
+    return (len(text) - nulls) * (_POINTER_BYTES + _PY_STR_BYTES) + chars + nulls * (_POINTER_BYTES + _PY_NAN_BYTES)
+
+
+def _cast(text, target):
+    """``text`` cast to ``target`` after trimming blanks, or None when any value does not convert."""
+    trimmed = pc.utf8_trim_whitespace(text)
+    trimmed = pc.if_else(pc.equal(trimmed, ""), pa.scalar(None, pa.string()), trimmed)
+    try:
+        return pc.cast(trimmed, target)
+    except (pa.ArrowInvalid, pa.ArrowNotImplementedError):
+        return None
+
+
+def _to_series(array):
+    if pa.types.is_integer(array.type):
+        series = array.to_pandas(types_mapper={pa.int64(): pd.Int64Dtype()}.get if array.null_count else None)
+        return pd.to_numeric(series, downcast="integer")
+    if pa.types.is_date(array.type):
+        return array.to_pandas(date_as_object=False)
+    return array.to_pandas()
+
+
+def parse_csv(file, table_schema):
+    """Parse an uploaded CSV into a compact DataFrame typed after ``table_schema``.
+
+    The file is read by ``pyarrow.csv`` on all cores with every column as
+    text; each column of the table is then cast to its Arrow type
+    (``arrow_type``) in one vectorized step. Integers are downcast to the
+    smallest width that holds them, and text columns with few distinct
+    values become categoricals; other text is kept in Arrow-backed strings
+    instead of Python objects. A column whose values do not all convert is
+    kept as text, so validation can still point at the offending rows.
+    Headers are stripped and upper-cased like before. Returns
+    ``(DataFrame, ParseReport)``.
+    """
+    started = time.perf_counter()
+    header = _read_header(file)
+    table = pa_csv.read_csv(
+        file,
+        read_options=pa_csv.ReadOptions(use_threads=True, block_size=PARSE_BLOCK_SIZE),
+        convert_options=pa_csv.ConvertOptions(
+            column_types={name: pa.string() for name in header},
+            strings_can_be_null=True,
+        ),
+    )
+    file.seek(0)
+
+    columns_by_name = {col.name: col for col in table_schema.columns}
+    report = ParseReport(rows=table.num_rows, threads=pa.cpu_count())
+    data = {}
+    for raw_name, text in zip(table.column_names, table.columns):
+        name = raw_name.strip().upper()
+        text = text.combine_chunks()
+        column = columns_by_name.get(name)
+        target = arrow_type(column) if column is not None else None
+        parsed = _cast(text, target) if target is not None else None
+        report.untyped_bytes += _untyped_bytes(text, parsed)
+        if parsed is not None:
+            data[name] = _to_series(parsed)
+            report.typed_columns.append(name)
+            continue
+        if target is not None:
+            report.text_fallback_columns.append(name)
+        non_null = len(text) - text.null_count
+        if non_null and pc.count_distinct(text).as_py() <= non_null * CATEGORY_MAX_RATIO:
+            data[name] = text.dictionary_encode().to_pandas()
+            report.category_columns.append(name)
+        else:
+            data[name] = text.to_pandas(types_mapper={pa.string(): pd.StringDtype("pyarrow")}.get)
+
+    df = pd.DataFrame(data)
+    report.memory_bytes = int(df.memory_usage(deep=True).sum())
+    report.seconds = time.perf_counter() - started
+    return df, report
@@ -0,0 +1,159 @@
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+
+import streamlit as st
+
+from streaming_ingest import IngestCancelled, ingest_chunks, read_csv_chunks, read_xlsx_chunks, spool_upload
+
+# Upload jobs running at once across all users of this app server.
+MAX_WORKERS = 4
+# Queued or running jobs allowed per user and per target table.
+MAX_ACTIVE_JOBS_PER_USER = 2
+MAX_ACTIVE_JOBS_PER_TABLE = 1
+# Finished jobs are kept this long for the status panel.
+FINISHED_JOB_RETENTION = 6 * 60 * 60
+
+ACTIVE_STATUSES = ("queued", "running")
+
+
+class JobLimitError(Exception):
+    pass
+
+
+@dataclass
+class UploadJob:
+    id: str
+    user: str
+    table_fqn: str
+    source: str
+    status: str = "queued"
+    rows_read: int = 0
+    rows_rejected: int = 0
+    rows_loaded: int = 0
+    rows_updated: int = 0
+    rows_per_second: float = 0.0
+    fraction: float = 0.0
+    errors: list = field(default_factory=list)
+    message: str = ""
+    submitted_at: float = field(default_factory=time.time)
+    finished_at: float = None
+    cancel_event: threading.Event = field(default_factory=threading.Event, repr=False)
+    future: object = field(default=None, repr=False)
+
+    @property
+    def active(self):
+        return self.status in ACTIVE_STATUSES
+
+    def cancel(self):
+        self.cancel_event.set()
+        if self.future is not None and self.future.cancel():
+            self._finish("cancelled", "Cancelled before it started.")
+
+    def _finish(self, status, message=""):
+        self.status = status
+        self.message = message
+        self.finished_at = time.time()
+
+
+class JobManager:
+    """Runs uploads on a shared thread pool so they survive reruns and closed tabs.
+
+    Each job leases its own session from the ``SessionPool`` so its
+    transaction never interleaves with the queries of the page that
+    submitted it. Progress is written onto the ``UploadJob`` and read back by
+    the status panel; no Streamlit calls happen on the worker threads.
+    """
+
+    def __init__(self, max_workers=MAX_WORKERS):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="upload-job")
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def jobs_for(self, user):
+        self._forget_old_jobs()
+        with self._lock:
+            jobs = [job for job in self._jobs.values() if job.user == user]
+        return sorted(jobs, key=lambda job: job.submitted_at, reverse=True)
+
+    def _forget_old_jobs(self):
+        cutoff = time.time() - FINISHED_JOB_RETENTION
+        with self._lock:
+            for job_id in [j.id for j in self._jobs.values() if j.finished_at and j.finished_at < cutoff]:
+                del self._jobs[job_id]
+
+    def submit(self, user, session_pool, table_schema, file, sheet_name=None, merge_keys=None):
+        """Copy ``file`` to disk and queue its ingest; raises ``JobLimitError`` when over a limit."""
+        if session_pool.shared_session:
+            # A job would run its transaction on the connection the users are working on
+            raise JobLimitError("Background uploads are not available when the app runs inside Snowflake.")
+        with self._lock:
+            active = [job for job in self._jobs.values() if job.active]
+            if sum(job.user == user for job in active) >= MAX_ACTIVE_JOBS_PER_USER:
+                raise JobLimitError(f"You already have {MAX_ACTIVE_JOBS_PER_USER} uploads running.")
+            if sum(job.table_fqn == table_schema.fqn for job in active) >= MAX_ACTIVE_JOBS_PER_TABLE:
+                raise JobLimitError(f"An upload into {table_schema.fqn} is already running.")
+            source = file.name if sheet_name is None else f"{file.name} [{sheet_name}]"
+            job = UploadJob(id=uuid.uuid4().hex[:8], user=user, table_fqn=table_schema.fqn, source=source)
+            self._jobs[job.id] = job
+
+        path = None
+        try:
+            path = spool_upload(file)
+            job.future = self._executor.submit(
+                self._run, job, session_pool, table_schema, path, sheet_name, merge_keys
+            )
+        except Exception as e:
+            # Otherwise the job would stay queued forever and hold the table's slot.
+            job._finish("failed", f"Could not queue the upload: {e}")
+            if path is not None:
+                os.unlink(path)
+            raise
+        # Runs for finished and for cancelled-while-queued jobs alike.
+        job.future.add_done_callback(lambda _: os.unlink(path))
+        return job
+
+    def _run(self, job, session_pool, table_schema, path, sheet_name, merge_keys):
+        if job.cancel_event.is_set():
+            job._finish("cancelled", "Cancelled before it started.")
+            return
+        job.status = "running"
+
+        def on_progress(progress):
+            job.rows_read = progress.rows_read
+            job.rows_rejected = progress.rows_rejected
+            job.rows_per_second = progress.rows_per_second
+            job.fraction = progress.fraction
+            job.errors = list(progress.errors)
+
+        try:
+            # Queues behind the pool's cap on background sessions instead of failing
+            with session_pool.lease(f"upload:{job.id}", timeout=None) as session, open(path, "rb") as handle:
+                if sheet_name is None:
+                    chunks = read_csv_chunks(handle)
+                else:
+                    chunks = read_xlsx_chunks(handle, sheet_name)
+                result, progress = ingest_chunks(
+                    session,
+                    chunks,
+                    table_schema,
+                    merge_keys=merge_keys,
+                    on_progress=on_progress,
+                    should_cancel=job.cancel_event.is_set,
+                )
+            on_progress(progress)
+            job.rows_loaded = result.rows_loaded
+            job.rows_updated = result.rows_updated
+            job._finish("succeeded", f"Loaded in {progress.elapsed:.1f}s.")
+        except IngestCancelled:
+            job._finish("cancelled", "Cancelled; nothing was written.")
+        except Exception as e:
+            job._finish("failed", f"Nothing was written: {e}")
+
+
+@st.cache_resource
+def get_job_manager():
+    return JobManager()
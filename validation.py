@@ -0,0 +1,207 @@
+from dataclasses import dataclass
+from functools import cached_property
+
+import pandas as pd
+
+from duplicate_check import find_duplicate_rows
+
+# Snowflake DATA_TYPE names (as reported by INFORMATION_SCHEMA.COLUMNS and synonyms) by family.
+FIXED_POINT_TYPES = {"NUMBER", "DECIMAL", "NUMERIC", "INT", "INTEGER", "BIGINT", "SMALLINT", "TINYINT", "BYTEINT"}
+FLOAT_TYPES = {"FLOAT", "FLOAT4", "FLOAT8", "DOUBLE", "DOUBLE PRECISION", "REAL"}
+TEXT_TYPES = {"TEXT", "VARCHAR", "STRING", "CHAR", "CHARACTER", "NCHAR", "NVARCHAR", "NVARCHAR2", "CHAR VARYING", "NCHAR VARYING"}
+DATE_TYPES = {"DATE"}
+TIMESTAMP_TYPES = {"TIMESTAMP", "TIMESTAMP_NTZ", "TIMESTAMP_LTZ", "TIMESTAMP_TZ", "DATETIME"}
+TIME_TYPES = {"TIME"}
+BOOLEAN_TYPES = {"BOOLEAN"}
+BOOLEAN_LITERALS = {"true", "false", "t", "f", "yes", "no", "y", "n", "on", "off", "1", "0"}
+
+
+@dataclass
+class ColumnCheck:
+    column: str
+    message: str
+    failed: callable  # (ColumnValues) -> boolean mask of failing rows
+
+
+@dataclass
+class ValidationResult:
+    errors: pd.DataFrame  # one boolean column per table column, True where a check failed
+    messages: dict  # {row index: [readable messages]}
+
+    @property
+    def invalid_rows(self):
+        return self.errors.index[self.errors.any(axis=1)]
+
+
+def _meta(col_meta, key):
+    try:
+        value = col_meta[key]
+    except (KeyError, IndexError, AttributeError):
+        return None
+    return None if pd.isna(value) else value
+
+
+class ColumnValues:
+    """One DataFrame column plus the conversions its checks share, each computed at most once."""
+
+    def __init__(self, values):
+        self.values = values
+
+    @cached_property
+    def text(self):
+        return self.values.astype("string[pyarrow]").str.strip()
+
+    @cached_property
+    def missing(self):
+        return self.values.isna() | self.text.eq("").fillna(True)
+
+    @cached_property
+    def numeric(self):
+        if pd.api.types.is_numeric_dtype(self.values):
+            return self.values
+        return pd.to_numeric(self.text, errors="coerce")
+
+    def is_datetime(self):
+        return pd.api.types.is_datetime64_any_dtype(self.values)
+
+
+def _no_failures(col):
+    return pd.Series(False, index=col.values.index)
+
+
+def _date_failures(col):
+    if col.is_datetime():
+        return _no_failures(col)
+    parsed = pd.to_datetime(col.text, format="%Y-%m-%d", errors="coerce")
+    retry = parsed.isna() & ~col.missing
+    if retry.any():
+        # Excel sheets hand over midnight timestamps for date cells.
+        stamps = pd.to_datetime(col.text[retry], format="ISO8601", errors="coerce")
+        parsed[retry] = stamps.where(stamps == stamps.dt.normalize())
+    return parsed.isna() & ~col.missing
+
+
+def _timestamp_failures(col):
+    if col.is_datetime():
+        return _no_failures(col)
+    parsed = pd.to_datetime(col.text, format="ISO8601", errors="coerce", utc=True)
+    return parsed.isna() & ~col.missing
+
+
+def _time_failures(col):
+    parsed = pd.to_datetime(col.text, format="%H:%M:%S", errors="coerce")
+    parsed = parsed.fillna(pd.to_datetime(col.text, format="%H:%M", errors="coerce"))
+    return parsed.isna() & ~col.missing
+
+
+def _boolean_failures(col):
+    if pd.api.types.is_bool_dtype(col.values):
+        return _no_failures(col)
+    return ~col.text.str.lower().isin(BOOLEAN_LITERALS) & ~col.missing
+
+
+def compile_checks(column_metadata):
+    """Turn ``INFORMATION_SCHEMA.COLUMNS`` rows into vectorized per-column checks."""
+    checks = []
+    for col_meta in column_metadata:
+        col_name = col_meta["COLUMN_NAME"]
+        data_type = str(col_meta["DATA_TYPE"]).upper()
+        is_nullable = col_meta["IS_NULLABLE"] == "YES"
+        max_length = _meta(col_meta, "CHARACTER_MAXIMUM_LENGTH")
+        precision = _meta(col_meta, "NUMERIC_PRECISION")
+        scale = _meta(col_meta, "NUMERIC_SCALE")
+
+        if not is_nullable:
+            checks.append(ColumnCheck(col_name, f"{col_name} cannot be NULL.", lambda col: col.missing))
+
+        if data_type in FIXED_POINT_TYPES:
+            checks.append(ColumnCheck(
+                col_name,
+                f"{col_name} must be a NUMBER.",
+                lambda col: col.numeric.isna() & ~col.missing,
+            ))
+            scale = int(scale or 0)
+            if scale == 0:
+                checks.append(ColumnCheck(
+                    col_name,
+                    f"{col_name} must be an INTEGER.",
+                    lambda col: (col.numeric % 1).fillna(0).ne(0),
+                ))
+            if precision:
+                limit = 10 ** (int(precision) - scale)
+                checks.append(ColumnCheck(
+                    col_name,
+                    f"{col_name} does not fit NUMBER({int(precision)},{scale}).",
+                    lambda col, limit=limit: col.numeric.abs().ge(limit).fillna(False),
+                ))
+        elif data_type in FLOAT_TYPES:
+            checks.append(ColumnCheck(
+                col_name,
+                f"{col_name} must be a FLOAT.",
+                lambda col: col.numeric.isna() & ~col.missing,
+            ))
+        elif data_type in TEXT_TYPES:
+            if max_length:
+                checks.append(ColumnCheck(
+                    col_name,
+                    f"{col_name} is longer than {int(max_length)} characters.",
+                    lambda col, max_length=int(max_length): col.values.astype("string").str.len().gt(max_length).fillna(False),
+                ))
+        elif data_type in DATE_TYPES:
+            checks.append(ColumnCheck(col_name, f"{col_name} must be in %Y-%m-%d format.", _date_failures))
+        elif data_type in TIMESTAMP_TYPES:
+            checks.append(ColumnCheck(col_name, f"{col_name} must be a timestamp (YYYY-MM-DD[ HH:MM:SS]).", _timestamp_failures))
+        elif data_type in TIME_TYPES:
+            checks.append(ColumnCheck(col_name, f"{col_name} must be a time (HH:MM[:SS]).", _time_failures))
+        elif data_type in BOOLEAN_TYPES:
+            checks.append(ColumnCheck(col_name, f"{col_name} must be TRUE or FALSE.", _boolean_failures))
+        # VARIANT, OBJECT, ARRAY, BINARY, GEOGRAPHY, ... are left to Snowflake.
+    return checks
+
+
+def validate_frame(df, checks):
+    """Run compiled ``checks`` over the whole of ``df`` at once."""
+    columns = list(dict.fromkeys(check.column for check in checks))
+    errors = pd.DataFrame(False, index=df.index, columns=columns)
+    messages = {}
+    column_values = {}
+
+    for check in checks:
+        if check.column not in column_values:
+            if check.column in df.columns:
+                values = df[check.column]
+            else:
+                values = pd.Series(pd.NA, index=df.index, dtype="object")
+            column_values[check.column] = ColumnValues(values)
+        failed = check.failed(column_values[check.column]).to_numpy(dtype=bool)
+        if not failed.any():
+            continue
+        errors[check.column] |= failed
+        for idx in df.index[failed]:
+            messages.setdefault(idx, []).append(check.message)
+
+    return ValidationResult(errors=errors, messages=messages)
+
+
+def validate_rows(session, df, table_schema, also_in=None):
+    """Validate every row of ``df`` and return ``{index: [errors]}`` for the rows that failed."""
+    # --- Field-level validation, column by column over the whole frame ---
+    row_errors = validate_frame(df, compile_checks(table_schema.column_metadata)).messages
+
+    # --- Full-row duplicate check (optional, separate from PK check) ---
+    # One set-based query for the whole batch; rows that already failed
+    # field validation are left out so bad values cannot break the join.
+    candidates = df.drop(index=list(row_errors))
+    duplicates = find_duplicate_rows(
+        session,
+        candidates,
+        table_schema.column_names,
+        table_schema.database,
+        table_schema.schema,
+        table_schema.table,
+        also_in=also_in,
+    )
+    for idx in duplicates:
+        row_errors.setdefault(idx, []).append(f"Duplicate row found: {df.loc[idx].to_dict()}")
+
+    return row_errors